@@ -4,17 +4,80 @@
 # In[ ]:
 
 from Wangview.Display import Display
+import multiprocessing
 import sys
 
 
 # In[ ]:
 
 if __name__ == '__main__':
+    # In a frozen executable, worker processes run from here
+    multiprocessing.freeze_support()
     import sys
+    if sys.argv[1:2] == ['generate']:
+        # Headless: bearlibterminal is never imported
+        from Wangview.Generator import main
+        main(sys.argv[2:])
+        sys.exit()
+    if sys.argv[1:2] == ['batch']:
+        from Wangview.BatchGenerator import main
+        main(sys.argv[2:])
+        sys.exit()
+    usage = ('Usage: Wangview.py [path [tile_groups.json [terrain_hypergraph.json [tileset_data.json]]]] [--map map_file [--edit]] [--size WxH] [--weights terrain=weight,...] [--autopilot frames [--report file]]\n'
+             '       Wangview.py generate path width height [options]\n'
+             '       Wangview.py batch path count width height -o directory [options]\n')
     try:
-        w = Display(*sys.argv[1:])
-        w.run()
+        args = sys.argv[1:]
+        options = {}
+        if '--map' in args:
+            # View a map file written by `generate --format map`
+            i = args.index('--map')
+            options['map_filename'] = args[i+1]
+            del args[i:i+2]
+        if '--edit' in args:
+            # Let the brush write to the map file
+            args.remove('--edit')
+            options['edit_map'] = True
+        if '--size' in args:
+            # Initial window size in tiles, such as 60x40
+            i = args.index('--size')
+            width, height = map(int, args[i+1].split('x'))
+            options['window_size'] = (width, height)
+            del args[i:i+2]
+        if '--weights' in args:
+            # Relative terrain weights, such as grass=4,water=0.5
+            from Wangview.Hypergraph import parse_weights
+            i = args.index('--weights')
+            options['terrain_weights'] = parse_weights(args[i+1])
+            del args[i:i+2]
+        autopilot = report_filename = None
+        if '--autopilot' in args:
+            # Soak test: pan along a scripted path for this many frames, then report
+            i = args.index('--autopilot')
+            autopilot = int(args[i+1])
+            del args[i:i+2]
+        if '--report' in args:
+            # Also write the autopilot's report to this JSON file
+            i = args.index('--report')
+            report_filename = args[i+1]
+            del args[i:i+2]
+    except (IndexError, ValueError):
+        # An option without a value, or with a malformed one
+        print(usage)
+        sys.exit(2)
+    try:
+        w = Display(*args, **options)
+        if autopilot is None:
+            w.run()
+        else:
+            from Wangview.Autopilot import Autopilot
+            report = Autopilot(w, autopilot).run()
+            print('\n'.join(Autopilot.report_lines(report)))
+            if report_filename is not None:
+                import json
+                with open(report_filename, 'w') as f:
+                    json.dump(report, f, indent=1)
     except (IndexError, FileNotFoundError):
-        print('Usage: Wangview.py [path [tile_groups.json [terrain_hypergraph.json [tileset_data.json]]]]\n')
+        print(usage)
         raise
 
@@ -0,0 +1,64 @@
+
+# coding: utf-8
+
+# In[ ]:
+
+import random
+
+
+# In[ ]:
+
+class AliasTable(object):
+    """
+    Samples indices in proportion to a sequence of weights
+    in constant time, using Vose's version of Walker's alias method.
+
+    Each index i owns an equal slice of [0, 1).
+    A uniform draw lands in slice i, and picks i itself
+    if its position within the slice is below thresholds[i],
+    and aliases[i] otherwise.
+    """
+    def __init__(self, weights):
+        """
+        Builds the table for `weights`, a sequence of non-negative numbers.
+        If every weight is zero, the indices are equally likely.
+        Raises ValueError if `weights` is empty or contains a negative weight.
+        """
+        weights = [float(w) for w in weights]
+        count = len(weights)
+        if count == 0:
+            raise ValueError('Cannot sample from an empty set of weights')
+        if min(weights) < 0:
+            raise ValueError('Weights must not be negative')
+        total = sum(weights)
+        if total == 0:
+            weights = [1.0]*count
+            total = float(count)
+        scaled = [w*count/total for w in weights]
+        self.thresholds = [1.0]*count
+        self.aliases = list(range(count))
+        small = [i for (i, p) in enumerate(scaled) if p < 1]
+        large = [i for (i, p) in enumerate(scaled) if p >= 1]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            # Slice s is topped up with the excess of l
+            self.thresholds[s] = scaled[s]
+            self.aliases[s] = l
+            scaled[l] += scaled[s] - 1
+            (small if scaled[l] < 1 else large).append(l)
+        # Whatever is left over is within rounding error of a full slice
+    def __len__(self):
+        return len(self.thresholds)
+    def sample(self, rng=random):
+        """Returns a random index, using one draw from `rng`"""
+        u = rng.random()*len(self.thresholds)
+        i = int(u)
+        return i if u-i < self.thresholds[i] else self.aliases[i]
+    def probabilities(self):
+        """Returns the probability of sampling each index"""
+        count = len(self.thresholds)
+        result = [t/count for t in self.thresholds]
+        for i, (t, a) in enumerate(zip(self.thresholds, self.aliases)):
+            result[a] += (1-t)/count
+        return result
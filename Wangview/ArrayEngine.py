@@ -0,0 +1,166 @@
+
+# coding: utf-8
+
+# In[ ]:
+
+import random
+import numpy as np
+
+
+# In[ ]:
+
+class ArrayEngine(object):
+    """
+    Generates integer-coded terrain grids as numpy arrays,
+    resolving whole lines of terrain with batched operations.
+    Terrain codes are those interned by a compiled `Hypergraph`,
+    and terrains are chosen with the weights it was compiled with.
+    """
+    def __init__(self, hypergraph, max_retries=16):
+        self.hypergraph = hypergraph
+        self.max_retries = max_retries
+        # Relative weight of each terrain code, or None if they are equally likely
+        self.weights = (None if hypergraph.weights is None else
+                        np.array(hypergraph.terrain_weights, dtype=float))
+        m = hypergraph.missing
+        # tile_options[a,b,c] is a boolean mask of the terrains
+        # which can share a tile with the coded terrains a, b, c.
+        # Any of a, b, c may be `missing`.
+        # Like `Hypergraph.options_mask`, it is the union of the cliques
+        # containing a, b and c, so each clique is added to the block
+        # of entries whose corners are all in it, or missing.
+        self.tile_options = np.zeros((m+1, m+1, m+1, m), dtype=bool)
+        for clique in hypergraph.clique_masks:
+            members = [i for i in range(m) if clique >> i & 1]
+            corners = np.array(members + [m])
+            self.tile_options[np.ix_(corners, corners, corners, members)] = True
+        # With no corners, every terrain is an option
+        self.tile_options[m, m, m] = True
+    def choose(self, options, rng):
+        """
+        Selects one random terrain code from each row of the boolean array
+        `options`, using a single batch of random draws.
+        With weights, each option is chosen in proportion to its weight,
+        like `Hypergraph.generate_line_codes`;
+        options whose weights are all zero are equally likely, as in `AliasTable`.
+        Raises IndexError if any row has no options.
+        """
+        counts = options.sum(axis=1)
+        if not counts.all():
+            raise IndexError('Cannot choose from an empty set of terrains')
+        if self.weights is None:
+            picks = (rng.random(len(counts))*counts).astype(np.intp)
+            return (options.cumsum(axis=1) > picks[:,np.newaxis]).argmax(axis=1)
+        weighted = (options*self.weights).cumsum(axis=1)
+        unweighted = weighted[:,-1] == 0
+        if unweighted.any():
+            weighted[unweighted] = options[unweighted].cumsum(axis=1)
+        picks = rng.random(len(counts))*weighted[:,-1]
+        return (weighted > picks[:,np.newaxis]).argmax(axis=1)
+    def generate_row(self, width, rng, previous_row=None, next_row=None):
+        """
+        Generates a row of terrain codes which satisfies adjacency constraints,
+        like `Hypergraph.generate_line_codes`.
+        If `next_row` is given, the row also agrees with it, as the row above it.
+
+        Cells are resolved in two interleaved passes.
+        Even cells depend only on `previous_row` and `next_row`,
+        so they are independent of each other and sampled together.
+        Odd cells are then sampled together, constrained by the even cells
+        to either side of them as well as by `previous_row` and `next_row`.
+        If an odd cell has no options, the even cells beside it are resampled,
+        up to `max_retries` times, after which the row is generated
+        sequentially by `Hypergraph.generate_line_codes`.
+        That can't take `next_row` into account, so with `next_row`,
+        IndexError is raised instead.
+        """
+        m = self.hypergraph.missing
+        options = self.tile_options
+        # Pad the previous row so that U, V, W can be read at (i, i+1, i+2)
+        up = np.full(width+2, m, dtype=np.intp)
+        if previous_row is not None:
+            up[1:width+1] = previous_row[:width]
+        # Every tile is a clique, so the row below constrains cells in the same way
+        down = np.full(width+2, m, dtype=np.intp)
+        if next_row is not None:
+            down[1:width+1] = next_row[:width]
+        row = np.full(width+2, m, dtype=np.intp)
+        even = np.arange(0, width, 2)
+        odd = np.arange(1, width, 2)
+        def even_options(i):
+            mask = options[up[i], up[i+1], m] & options[up[i+1], up[i+2], m]
+            if next_row is not None:
+                mask &= options[down[i], down[i+1], m] & options[down[i+1], down[i+2], m]
+            return mask
+        def odd_options(i):
+            mask = (options[up[i], up[i+1], row[i]] &
+                    options[up[i+1], up[i+2], row[i+2]])
+            if next_row is not None:
+                mask &= (options[down[i], down[i+1], row[i]] &
+                         options[down[i+1], down[i+2], row[i+2]])
+            return mask
+        row[even+1] = self.choose(even_options(even), rng)
+        pending = odd
+        for attempt in range(self.max_retries+1):
+            odd_options_pending = odd_options(pending)
+            resolved = odd_options_pending.any(axis=1)
+            if resolved.any():
+                row[pending[resolved]+1] = self.choose(
+                    odd_options_pending[resolved], rng)
+            pending = pending[~resolved]
+            if len(pending) == 0 or attempt == self.max_retries:
+                break
+            # Resample the even neighbours of the failed odd cells,
+            # then retry every odd cell adjacent to a resampled even cell
+            redraw = np.union1d(pending-1, pending+1)
+            redraw = redraw[redraw < width]
+            row[redraw+1] = self.choose(even_options(redraw), rng)
+            pending = np.union1d(redraw-1, redraw+1)
+            pending = pending[(pending >= 0) & (pending < width)]
+        if len(pending) and next_row is not None:
+            raise IndexError('Cannot fit a row between the given rows')
+        if len(pending):
+            # A rare dead end: generate the row one cell at a time instead,
+            # which never gets stuck after a valid previous row
+            line = self.hypergraph.generate_line_codes(
+                width, None if previous_row is None else previous_row[:width].tolist(),
+                random.Random(int(rng.integers(1 << 63))))
+            return np.array(line, dtype=np.intp)
+        return row[1:width+1]
+    def iter_rows(self, width, height, rng, previous_row=None):
+        """
+        Yields `height` rows of terrain codes as numpy arrays.
+        If `previous_row` is given, the first row agrees with it.
+        """
+        row = previous_row
+        for i in range(height):
+            row = self.generate_row(width, rng, row)
+            yield row
+    def generate(self, width, height, seed=None):
+        """
+        Returns a (height, width) int32 array of terrain codes
+        satisfying the same adjacency constraints as `Hypergraph.generate_lines`.
+        The result is reproducible for a given `seed`.
+        """
+        rng = np.random.default_rng(seed)
+        grid = np.empty((height, width), dtype=np.int32)
+        for y, row in enumerate(self.iter_rows(width, height, rng)):
+            grid[y] = row
+        return grid
+    def is_valid(self, grid):
+        """
+        Returns True if every tile in `grid` has corners
+        which can legally be placed in the same tile.
+        """
+        grid = np.asarray(grid, dtype=np.intp)
+        a, b = grid[:-1,:-1], grid[:-1,1:]
+        c, d = grid[1:,:-1], grid[1:,1:]
+        return bool(self.tile_options[a, b, c, d].all())
+    def encode(self, lines):
+        """Converts a sequence of lines of terrains into an int32 array of terrain codes"""
+        return np.array([self.hypergraph.encode_line(line) for line in lines],
+                        dtype=np.int32)
+    def decode(self, grid):
+        """Converts an array of terrain codes into a list of lists of terrains"""
+        terrains = np.array(self.hypergraph.terrains, dtype=object)
+        return terrains[grid].tolist()
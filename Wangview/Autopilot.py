@@ -0,0 +1,157 @@
+
+# coding: utf-8
+
+# In[ ]:
+
+from bisect import bisect_right
+from itertools import accumulate
+import sys
+from time import perf_counter
+from .FrameProfiler import FrameProfiler
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+
+# In[ ]:
+
+def peak_rss():
+    """Returns the peak resident set size of this process in bytes, or None if it is unknown"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, other systems kilobytes
+    return rss if sys.platform == 'darwin' else rss*1024
+
+
+# In[ ]:
+
+class Autopilot(object):
+    """
+    Drives a Display's run loop for a soak test:
+    pans the view along a scripted path instead of the keyboard and mouse,
+    replaces the scene every `regenerate_every` frames (or never, if it is 0),
+    and stops after `frames` frames or `duration` seconds, whichever comes first.
+    `run` returns a report of the frame rate and frame times achieved.
+
+    The path is a sequence of (x direction, y direction, frames) segments,
+    followed in a loop; each frame of a segment pans the view
+    as if the arrow keys for its directions were held.
+    """
+    # Around the eight compass directions, returning to the start
+    default_path = ((1, 0, 90), (1, 1, 90), (0, 1, 90), (-1, 1, 90),
+                    (-1, 0, 90), (-1, -1, 90), (0, -1, 90), (1, -1, 90))
+    def __init__(self, display, frames=600, duration=None,
+                 path=default_path, regenerate_every=150):
+        if frames is None and duration is None:
+            raise ValueError('An autopilot needs a number of frames or a duration')
+        self.display = display
+        self.frames = frames
+        self.duration = duration
+        self.path = path
+        # Frame at which each segment of the path ends
+        self.segment_ends = list(accumulate(frames for (x, y, frames) in path))
+        self.regenerate_every = regenerate_every
+        self.frame = 0
+        self.start_time = None
+        # Time taken by each call to `Display.new_scene`, which only swaps in
+        # a scene generated ahead of time when generating in the background
+        self.request_times = []
+        # Time taken to generate each scene shown, wherever it was generated
+        self.generation_times = []
+        self.scene_count = display.scene_count
+    def direction(self, frame):
+        """Returns the (x, y) direction of the path on frame number `frame`"""
+        i = bisect_right(self.segment_ends, frame % self.segment_ends[-1])
+        return self.path[i][:2]
+    def step(self):
+        """
+        Pans the view and replaces the scene as scripted for the current frame,
+        and returns True once the autopilot is finished.
+        Called by `Display.run` once per frame, after handling input.
+        """
+        display = self.display
+        if self.start_time is None:
+            self.start_time = perf_counter()
+        x, y = self.direction(self.frame)
+        display.pan(x*display.scroll_speed, y*display.scroll_speed)
+        self.frame += 1
+        if self.regenerate_every and self.frame % self.regenerate_every == 0:
+            with display.profiler.stage('regenerate'):
+                start = perf_counter()
+                display.new_scene()
+                self.request_times.append(perf_counter() - start)
+        # A scene generated in the background may be shown on a later frame
+        if display.scene_count != self.scene_count:
+            self.scene_count = display.scene_count
+            self.generation_times.append(display.scene_generation_time)
+        return ((self.frames is not None and self.frame >= self.frames) or
+                (self.duration is not None and
+                 perf_counter() - self.start_time >= self.duration))
+    def run(self):
+        """
+        Runs the display with the autopilot until it is finished,
+        and returns the report (see `report`).
+        """
+        # Keep every frame, so that percentiles cover the whole run
+        self.display.profiler.close()
+        self.display.profiler = FrameProfiler(window=None)
+        self.display.run(self)
+        return self.report()
+    def report(self):
+        """
+        Returns a dict of the results of the run:
+        the frames drawn, their total time in seconds, the frame rate achieved and the target,
+        the percentiles of frame times ('frame_time'),
+        and of frame times without waiting for the frame rate limiter ('busy_time'),
+        the percentiles of the time spent in each stage of a frame ('stages'),
+        whose 'regenerate' stage includes generating the rows and columns panned into view,
+        and for scene replacements ('scenes'), the number requested and shown,
+        and the times taken to generate the scenes shown ('generation')
+        and by the requests in the frame loop ('request'),
+        which only swap in a finished scene when scenes are generated in the background,
+        and the peak resident set size of the process in bytes ('peak_rss').
+        Times are in seconds; percentiles are dicts from `FrameProfiler.summarize`.
+        """
+        display = self.display
+        profiler = display.profiler
+        history = profiler.history
+        seconds = sum(history['frame'])
+        busy = [frame - wait for frame, wait in zip(history['frame'], history['wait'])]
+        stats = profiler.stats()
+        return {'frames': len(history['frame']),
+                'size': [display.tile_width, display.tile_height],
+                'seconds': seconds,
+                'fps': len(history['frame'])/seconds if seconds else 0.,
+                'target_fps': display.fps_limiter.get_max_fps(),
+                'frame_time': stats.get('frame'),
+                'busy_time': profiler.summarize(busy) if busy else None,
+                'stages': {name: stats[name] for name in profiler.stages + ('other',)
+                           if name in stats},
+                'scenes': {'requested': len(self.request_times),
+                           'shown': len(self.generation_times),
+                           'generation': (profiler.summarize(self.generation_times)
+                                          if self.generation_times else None),
+                           'request': (profiler.summarize(self.request_times)
+                                       if self.request_times else None)},
+                'peak_rss': peak_rss()}
+    @staticmethod
+    def report_lines(report):
+        """Returns a report from `report` as short lines of text, with times in milliseconds"""
+        lines = ['{0} frames of {1}x{2} tiles in {3:.2f}s: {4:.1f} fps (target {5})'.format(
+                     report['frames'], report['size'][0], report['size'][1],
+                     report['seconds'], report['fps'], report['target_fps']),
+                 '{0:<11}{1:>8}{2:>8}{3:>8}{4:>8}'.format('ms', 'p50', 'p95', 'p99', 'max')]
+        rows = [('frame', report['frame_time']), ('busy', report['busy_time'])]
+        rows.extend(report['stages'].items())
+        rows.extend([('scene gen', report['scenes']['generation']),
+                     ('scene req', report['scenes']['request'])])
+        for name, s in rows:
+            if s is not None:
+                lines.append('{0:<11}{1:>8.2f}{2:>8.2f}{3:>8.2f}{4:>8.2f}'.format(
+                    name, s['p50']*1e3, s['p95']*1e3, s['p99']*1e3, s['max']*1e3))
+        if report['peak_rss'] is not None:
+            lines.append('peak RSS {0:.1f} MiB'.format(report['peak_rss']/2**20))
+        return lines
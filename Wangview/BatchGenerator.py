@@ -0,0 +1,136 @@
+
+# coding: utf-8
+
+# In[ ]:
+
+from concurrent.futures import ProcessPoolExecutor
+import json
+import multiprocessing
+import os
+from os import path
+from time import perf_counter
+from .Generator import Generator
+from .Hypergraph import parse_weights
+
+
+# In[ ]:
+
+# State of a worker process, set once by `init_worker`
+_worker = {}
+
+def init_worker(hypergraph, tile_index):
+    """Creates the Generator used to generate maps in a worker process"""
+    _worker['generator'] = Generator.from_compiled(hypergraph, tile_index)
+
+def generate_map(filename, width, height, seed):
+    """
+    Writes the map generated from `seed` to the MapFile `filename`,
+    and returns its manifest entry.
+    """
+    start = perf_counter()
+    _worker['generator'].write_map(filename, width, height, seed)
+    return {'file': path.basename(filename),
+            'seed': seed,
+            'width': width,
+            'height': height,
+            'bytes': path.getsize(filename),
+            'seconds': perf_counter() - start}
+
+
+# In[ ]:
+
+class BatchGenerator(object):
+    """
+    Generates many maps of the same size in parallel, for datasets and testing.
+
+    Metadata is read once, and the compiled Hypergraph and TileIndex
+    are sent to each worker process once, when it starts.
+    Every map is written by its worker to its own MapFile in the output directory,
+    and is identical to the map `Generator.write_map` writes for its seed.
+    """
+    manifest_filename = 'manifest.jsonl'
+    def __init__(self, generator, workers=None):
+        """Uses the metadata of `generator`, a Generator"""
+        self.hypergraph = generator.hypergraph
+        self.tile_index = generator.tile_index
+        self.workers = workers or os.cpu_count() or 1
+    @staticmethod
+    def map_filename(directory, index):
+        """Returns the name of the file of the map with position `index` in a batch"""
+        return path.join(directory, 'map{0:06d}.wvmap'.format(index))
+    def generate(self, directory, count, width, height, seed=0):
+        """
+        Writes `count` maps of `width` by `height` tiles to `directory`,
+        where map i is generated from seed `seed`+i,
+        and yields the manifest entry of each map in order, as it is finished.
+        Each entry is also appended to the manifest, a JSON-lines file in `directory`,
+        so the manifest of an interrupted batch lists the maps that were finished.
+        With one worker, everything is generated in this process.
+        """
+        os.makedirs(directory, exist_ok=True)
+        arguments = ([self.map_filename(directory, i) for i in range(count)],
+                     [width]*count, [height]*count,
+                     [seed+i for i in range(count)])
+        with open(path.join(directory, self.manifest_filename), 'w') as manifest:
+            if self.workers == 1:
+                init_worker(self.hypergraph, self.tile_index)
+                yield from self.write_manifest(manifest, map(generate_map, *arguments))
+                return
+            # Several maps are sent to a worker at a time, to amortize the round trips
+            chunksize = max(1, min(16, count//(4*self.workers)))
+            with ProcessPoolExecutor(self.workers, multiprocessing.get_context('spawn'),
+                                     initializer=init_worker,
+                                     initargs=(self.hypergraph, self.tile_index)) as executor:
+                yield from self.write_manifest(
+                    manifest, executor.map(generate_map, *arguments, chunksize=chunksize))
+    def write_manifest(self, manifest, entries):
+        """Appends each entry to the open manifest file, and yields it"""
+        for entry in entries:
+            manifest.write(json.dumps(entry) + '\n')
+            manifest.flush()
+            yield entry
+    def run(self, directory, count, width, height, seed=0):
+        """
+        Generates a batch of maps (see `generate`),
+        and returns a dict of the number of maps, bytes written,
+        elapsed time, maps per second, and workers used.
+        """
+        start = perf_counter()
+        written = 0
+        for entry in self.generate(directory, count, width, height, seed):
+            written += entry['bytes']
+        elapsed = perf_counter() - start
+        return {'maps': count,
+                'bytes': written,
+                'seconds': elapsed,
+                'maps_per_second': count/elapsed if elapsed else float('inf'),
+                'workers': self.workers}
+
+
+# In[ ]:
+
+def main(argv=None):
+    """Runs the `batch` command, with arguments from `argv` or the command line"""
+    import argparse
+    parser = argparse.ArgumentParser(
+        prog='Wangview.py batch',
+        description='Generate many random Wangscape maps in parallel, as map files')
+    parser.add_argument('path', help='Wangscape output directory')
+    parser.add_argument('count', type=int, help='number of maps')
+    parser.add_argument('width', type=int, help='map width in tiles')
+    parser.add_argument('height', type=int, help='map height in tiles')
+    parser.add_argument('--output', '-o', required=True, help='directory to write the maps to')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first map')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes (default: one per cpu)')
+    parser.add_argument('--weights', type=parse_weights, default=None,
+                        help='relative terrain weights, such as grass=4,water=0.5')
+    args = parser.parse_args(argv)
+    batch = BatchGenerator(Generator(args.path, terrain_weights=args.weights), args.workers)
+    stats = batch.run(args.output, args.count, args.width, args.height, args.seed)
+    print('Wrote {maps} maps ({bytes} bytes) in {seconds:.2f}s with {workers} workers '
+          '({maps_per_second:.2f} maps/s)'.format(**stats))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+
+# coding: utf-8
+
+# In[ ]:
+
+from collections import OrderedDict
+
+
+# In[ ]:
+
+class ChunkCache(object):
+    """
+    A size-bounded least-recently-used cache,
+    counting hits, misses, and evictions.
+    """
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self._items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    def __len__(self):
+        return len(self._items)
+    def __contains__(self, key):
+        return key in self._items
+    def get(self, key, factory):
+        """
+        Returns the value stored for `key`, marking it as recently used.
+        On a miss, stores and returns `factory(*key)`,
+        evicting the least recently used value if the cache is full.
+        """
+        if key in self._items:
+            self.hits += 1
+            self._items.move_to_end(key)
+            return self._items[key]
+        self.misses += 1
+        value = self._items[key] = factory(*key)
+        if len(self._items) > self.capacity:
+            self._items.popitem(last=False)
+            self.evictions += 1
+        return value
+    def put(self, key, value):
+        """
+        Stores `value` for `key` without counting a hit or miss,
+        evicting the least recently used value if the cache is full.
+        """
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if len(self._items) > self.capacity:
+            self._items.popitem(last=False)
+            self.evictions += 1
+    def clear(self):
+        """Removes every value from the cache, without resetting the counters"""
+        self._items.clear()
+    def stats(self):
+        """Returns a dict of the cache's size and counters"""
+        return {'size': len(self._items),
+                'capacity': self.capacity,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions}
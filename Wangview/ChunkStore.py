@@ -0,0 +1,207 @@
+
+# coding: utf-8
+
+# In[ ]:
+
+from collections import namedtuple
+import random
+from .ChunkCache import ChunkCache
+
+
+# In[ ]:
+
+Chunk = namedtuple('Chunk', ['terrain', 'tiles'])
+
+
+# In[ ]:
+
+class ChunkStore(object):
+    """
+    Generates an unbounded world deterministically from a seed,
+    one square chunk at a time, and caches recently used chunks.
+
+    Each chunk has `chunk_size`+1 lines of terrain and `chunk_size` lines of tiles,
+    so neighbouring chunks share a seam of terrain values.
+    Seams must agree regardless of the order in which chunks are generated,
+    so the world is built in two passes of blocks:
+    1. Base blocks, offset by half a chunk, are filled with random terrain
+       inside a border of a single terrain (`base_terrain`).
+    2. Each chunk keeps the base terrain on its edges as its seams,
+       and its interior is refilled to agree with them.
+    Both passes fill a block a line at a time inside its border with `fill`,
+    which never gets stuck, because it is guided by lines known to lead to the border:
+    the top half of a base block in reverse, and the base terrain for a chunk.
+    Every block uses its own random number generator seeded from
+    the world seed and the block's coordinates.
+
+    Terrain and tiles can also be edited (see `set_terrain` and `set_tile`);
+    edited chunks are kept apart from the cache, until the world is reseeded.
+    """
+    def __init__(self, hypergraph, tile_groups, seed, chunk_size=16, capacity=256):
+        self.hypergraph = hypergraph
+        self.tile_groups = tile_groups
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.cache = ChunkCache(capacity)
+        self.base_cache = ChunkCache(capacity)
+        # Edited chunks, which are never evicted
+        self.edits = {}
+        # Memoized results of `fill_mask`
+        self.fill_masks = {}
+        # The terrain in the most cliques is the least likely to cause dead ends
+        self.base_terrain = max(range(hypergraph.missing),
+                                key=lambda t: (sum(c >> t & 1 for c in hypergraph.clique_masks), -t))
+    def reseed(self, seed):
+        """Replaces the world with the one generated from `seed`"""
+        self.seed = seed
+        self.cache.clear()
+        self.base_cache.clear()
+        self.edits.clear()
+    def rng(self, kind, bx, by):
+        """
+        Returns a random number generator
+        for one kind of block at block coordinates (bx, by).
+        String seeds are hashed deterministically by `random.Random`.
+        """
+        return random.Random('{0}/{1}/{2}/{3}'.format(self.seed, kind, bx, by))
+    def fill(self, grid, guide, rng, start, stop):
+        """
+        Refills lines `start` to `stop`-1 of `grid`, a list of lines of terrain codes,
+        one line at a time, inside the border of the grid's first and last columns.
+        Each line agrees with the line above it, and with the next line of `guide`,
+        a list of lines leading validly to the grid's last line, unless it is None.
+        So if a cell has no options, the guide's own line fits instead,
+        or without a guide, a copy of the line above.
+        Unlike `Hypergraph.fill_region`, this never backtracks.
+        """
+        masks = self.fill_masks
+        end = len(grid[0])-1
+        for y in range(start, stop):
+            above, line, below = grid[y-1], grid[y], guide[y+1]
+            for x in range(1, end):
+                neighbourhood = (line[x-1], above[x-1], above[x], above[x+1],
+                                 line[end] if x == end-1 else None,
+                                 *((None, None, None) if below is None else below[x-1:x+2]))
+                mask = masks.get(neighbourhood)
+                if mask is None:
+                    mask = masks[neighbourhood] = self.fill_mask(*neighbourhood)
+                if not mask:
+                    grid[y] = list(above if guide[y] is None else guide[y])
+                    break
+                line[x] = rng.choice(self.hypergraph.mask_options(mask))
+    def fill_mask(self, left, up_left, up, up_right, right, down_left, down, down_right):
+        """
+        Returns a bitmask of the terrains which can be placed in a cell by `fill`,
+        given its neighbours; `right` is None unless it is a border cell,
+        and the neighbours below are None without a guide.
+        """
+        hypergraph = self.hypergraph
+        options_mask = hypergraph.options_mask
+        mask = hypergraph.neighbourhood_mask(left, up_left, up, up_right)
+        if right is not None:
+            mask &= options_mask(up, up_right, right)
+        if down is not None:
+            mask &= options_mask(left, down_left, down) & options_mask(down, down_right)
+            if right is not None:
+                mask &= options_mask(right, down, down_right)
+        return mask
+    def generate_base_block(self, bx, by):
+        """
+        Generates the terrain codes of base block (bx, by),
+        whose top left corner is at ((bx-1/2)*chunk_size, (by-1/2)*chunk_size).
+        The top half is filled freely, and the bottom half is guided
+        by the top half in reverse, back to the border.
+        """
+        size = self.chunk_size
+        t = self.base_terrain
+        rng = self.rng('base', bx, by)
+        grid = [[t]*(size+1) for i in range(size+1)]
+        middle = size//2
+        self.fill(grid, [None]*(size+1), rng, 1, middle+1)
+        guide = [grid[max(0, 2*middle-y)] for y in range(size+1)]
+        self.fill(grid, guide, rng, middle+1, size)
+        return grid
+    def base_block(self, bx, by):
+        """Returns base block (bx, by), generating it only if it is not cached"""
+        return self.base_cache.get((bx, by), self.generate_base_block)
+    def chunk_terrain(self, cx, cy):
+        """
+        Generates the terrain codes of chunk (cx, cy),
+        whose top left corner is at (cx*chunk_size, cy*chunk_size).
+        """
+        size = self.chunk_size
+        base = self.gather(self.base_block, size//2,
+                           cx*size, cy*size, size+1, size+1)
+        grid = [list(line) for line in base]
+        self.fill(grid, base, self.rng('chunk', cx, cy), 1, size)
+        return grid
+    def generate_chunk(self, cx, cy):
+        """Generates the terrain and tiles of chunk (cx, cy)"""
+        size = self.chunk_size
+        terrain = [self.hypergraph.decode_line(line)
+                   for line in self.chunk_terrain(cx, cy)]
+        rng = self.rng('tiles', cx, cy)
+        tiles = [[rng.choice(self.tile_groups[(a[x], b[x], a[x+1], b[x+1])])
+                  for x in range(size)]
+                 for (a, b) in zip(terrain, terrain[1:])]
+        return Chunk(terrain, tiles)
+    def chunk(self, cx, cy):
+        """
+        Returns chunk (cx, cy), generating it only if it is not cached
+        and has not been edited.
+        """
+        edited = self.edits.get((cx, cy))
+        if edited is not None:
+            return edited
+        return self.cache.get((cx, cy), self.generate_chunk)
+    def edited_chunk(self, cx, cy):
+        """Returns chunk (cx, cy) as an edited chunk, which can be changed in place"""
+        edited = self.edits.get((cx, cy))
+        if edited is None:
+            chunk = self.chunk(cx, cy)
+            edited = self.edits[(cx, cy)] = Chunk([list(line) for line in chunk.terrain],
+                                                  [list(line) for line in chunk.tiles])
+        return edited
+    def set_terrain(self, x, y, terrain):
+        """
+        Replaces the terrain at (x, y) in world coordinates,
+        in every chunk which shares it.
+        The tiles it is a corner of must be replaced to match, by `set_tile`.
+        """
+        size = self.chunk_size
+        for cy in {y//size, (y-1)//size}:
+            for cx in {x//size, (x-1)//size}:
+                self.edited_chunk(cx, cy).terrain[y-cy*size][x-cx*size] = terrain
+    def set_tile(self, x, y, tile):
+        """Replaces the tile at (x, y) in world coordinates"""
+        size = self.chunk_size
+        cx, lx = divmod(x, size)
+        cy, ly = divmod(y, size)
+        self.edited_chunk(cx, cy).tiles[ly][lx] = tile
+    def gather(self, block, offset, x, y, width, height):
+        """
+        Returns a list of lines of the region with top left corner (x, y)
+        in world coordinates, read from the blocks returned by `block(bx, by)`,
+        where block (0, 0) has its top left corner at (-offset, -offset).
+        """
+        size = self.chunk_size
+        lines = []
+        for wy in range(y+offset, y+offset+height):
+            by, ly = divmod(wy, size)
+            line = []
+            wx = x+offset
+            while wx < x+offset+width:
+                bx, lx = divmod(wx, size)
+                end = min(size, lx+x+offset+width-wx)
+                line.extend(block(bx, by)[ly][lx:end])
+                wx += end-lx
+            lines.append(line)
+        return lines
+    def terrain_region(self, x, y, width, height):
+        """Returns a list of lines of terrain, with top left corner (x, y)"""
+        return self.gather(lambda cx, cy: self.chunk(cx, cy).terrain,
+                           0, x, y, width, height)
+    def tile_region(self, x, y, width, height):
+        """Returns a list of lines of tile codepoints, with top left corner (x, y)"""
+        return self.gather(lambda cx, cy: self.chunk(cx, cy).tiles,
+                           0, x, y, width, height)
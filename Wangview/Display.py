@@ -1,14 +1,24 @@
 
 # coding: utf-8
-from bearlibterminal import terminal as blt
 import json
-from collections import deque
 from itertools import product
 import random
 from os import path
+from time import perf_counter
+import numpy as np
+from .Terminal import terminal as blt
 from .Tileset import Tileset
+from .RingGrid import RingGrid
 from .Hypergraph import Hypergraph
+from .TileIndex import TileIndex
+from .ChunkStore import ChunkStore
 from .FPSLimiter import FPSLimiter
+from .FrameProfiler import FrameProfiler
+from .SceneWorker import SceneWorker
+from .MetadataCache import MetadataCache
+from .MapFile import MapFile
+from .TerrainPyramid import TerrainPyramid
+from .Renderer import Renderer
 
 class Display(object):
     """
@@ -16,23 +26,226 @@ class Display(object):
     stores terrain and tile grids,
     and interfaces with bearlibterminal to draw a scene.
     """
+    # Tiles are loaded into unicode private space, starting here
+    codepoint_base = 0xE000
+    # Terminal layer used for the frame statistics overlay
+    overlay_layer = 1
+    # Compiled metadata is cached in this file in the metadata directory
+    cache_filename = '.wangview-cache'
+    # Size of the window in cells when it is opened
+    window_size = (30, 20)
+    # Maximum size in cells of the minimap of a map file
+    minimap_size = (10, 8)
+    # Maximum number of terrain values generated per frame while the window grows
+    resize_budget = 4096
+    # Shapes of the re-roll brush, see `reroll`
+    brush_shapes = ('square', 'circle')
+    # Maximum backtracks when re-rolling the terrain inside the brush
+    brush_backtracks = 1000
     def __init__(self,
                  rel_path='.',
                  fn_tile_groups='tile_groups.json',
                  fn_terrain_hypergraph='terrain_hypergraph.json',
                  fn_tileset_data='tilesets.json',
-                 fps=30):
+                 fps=30,
+                 scroll_speed=4,
+                 world_seed=None,
+                 chunk_size=16,
+                 chunk_capacity=256,
+                 profile_log=None,
+                 precise_pacing=False,
+                 background_regeneration=True,
+                 metadata_cache=True,
+                 map_filename=None,
+                 terrain_weights=None,
+                 batch_rows=True,
+                 window_size=(30, 20),
+                 edit_map=False):
+        self.window_size = window_size
         # Initialise file path and metadata
-        self.rel_path = rel_path
-        with open(path.join(rel_path, fn_tileset_data),'r') as f:
-            self.init_tilesets(json.load(f))
-        with open(path.join(rel_path,fn_tile_groups),'r') as f:
-            self.init_tile_groups(json.load(f))
-        with open(path.join(rel_path, fn_terrain_hypergraph),'r') as f:
-            self.hypergraph = Hypergraph(json.load(f))
+        self.init_metadata(rel_path, fn_tile_groups,
+                           fn_terrain_hypergraph, fn_tileset_data, metadata_cache,
+                           terrain_weights)
+        self.rng = np.random.default_rng()
+        # With a world seed, the maps are a viewport onto a deterministic world
+        # generated in chunks, otherwise every scene is independently random
+        if world_seed is None:
+            self.world = None
+        else:
+            self.world = ChunkStore(self.hypergraph, self.tile_groups, world_seed,
+                                    chunk_size, chunk_capacity)
+        # With a map file, the maps are a viewport onto a map stored on disk,
+        # which the brush can edit if `edit_map` is set
+        self.map_file = (None if map_filename is None else
+                         self.open_map(map_filename, 'r+' if edit_map else 'r'))
+        # World coordinates of the top left tile
+        self.origin_x = 0
+        self.origin_y = 0
         # Initialise geometry info
-        self.terminal_width = blt.state(blt.TK_WIDTH)
-        self.terminal_height = blt.state(blt.TK_HEIGHT)
+        self.init_geometry(*self.fit_size(blt.state(blt.TK_WIDTH),
+                                          blt.state(blt.TK_HEIGHT)))
+        # Size the maps are being resized to, see `step_resize`
+        self.target_size = (self.terminal_width, self.terminal_height)
+        # Pixels scrolled per frame while an arrow key is held
+        self.scroll_speed = scroll_speed
+        # Last mouse position in pixels while dragging, otherwise None
+        self.drag_position = None
+        # Tiles which have changed since they were last drawn
+        self.dirty_tiles = set()
+        self.all_dirty = True
+        # Every terminal call made by `draw()` goes through the renderer
+        self.renderer = Renderer()
+        # Whether to draw whole rows of tiles at once, see `draw()`
+        self.batch_rows = batch_rows
+        # Cached arguments for every put_ext call, see `draw()`
+        self.draw_list = None
+        # Cached text of each row of tiles, see `draw_rows()`
+        self.row_list = None
+        # Select terrain values
+        self.init_terrain_map()
+        # Select tile values based on terrain values
+        self.init_tile_map()
+        # Throttle framerate
+        self.fps_limiter = FPSLimiter(fps, precise=precise_pacing)
+        # Time each stage of every frame, optionally logging to a JSON-lines file
+        self.profiler = FrameProfiler(log_filename=profile_log)
+        self.show_profile = False
+        # While running, the next scene is generated in another process
+        self.background_regeneration = background_regeneration
+        self.scene_worker = None
+        # Whether a new scene should be shown as soon as it is ready
+        self.flip_pending = False
+        # Number of scenes which have replaced the first,
+        # and the seconds taken to generate the latest, wherever it was generated
+        self.scene_count = 0
+        self.scene_generation_time = None
+        # Overview of a map file, built when it is first shown; see `overview_pyramid`
+        self.pyramid = None
+        self.swatches = None
+        # Pyramid level of the zoomed out view, or 0 to draw tiles
+        self.zoom = 0
+        # Whether the maps need to be read again after panning while zoomed out
+        self.view_stale = False
+        self.show_minimap = False
+        # The brush re-rolls a square or circle of terrain of this radius around the mouse
+        self.brush_radius = 2
+        self.brush_shape = self.brush_shapes[0]
+        # Terrain value last re-rolled around while the right mouse button is held,
+        # otherwise None
+        self.brush_position = None
+    def init_metadata(self, rel_path, fn_tile_groups,
+                      fn_terrain_hypergraph, fn_tileset_data, use_cache=True,
+                      terrain_weights=None):
+        """
+        Reads the three Wangscape metadata files in `rel_path`
+        and converts them into a format suitable for Wangview.
+        If `use_cache` is True, the compiled metadata is read from
+        a MetadataCache in `rel_path` if the files haven't changed since it was written,
+        and written to it otherwise.
+        `terrain_weights` is an optional dict of the relative frequencies
+        of terrains, which are compiled into the hypergraph's alias tables
+        (see `Hypergraph.compile_weights`).
+        Stores the time taken in self.metadata_load_time,
+        and whether the cache was used in self.metadata_cache_hit.
+        The hypergraph's options are computed as they are used,
+        so the cache is written again by `save_metadata_cache` when Wangview quits.
+        """
+        start = perf_counter()
+        self.rel_path = rel_path
+        cache = MetadataCache([path.join(rel_path, fn) for fn in
+                               (fn_tileset_data, fn_tile_groups, fn_terrain_hypergraph)],
+                              path.join(rel_path, self.cache_filename))
+        cached = cache.load() if use_cache else None
+        # The cache and the data it is written with, see `save_metadata_cache`
+        self.cache = None
+        self.cache_data = None
+        if cached is None:
+            with open(path.join(rel_path, fn_tileset_data),'r') as f:
+                raw_tileset_data = json.load(f)
+                self.init_tilesets(raw_tileset_data)
+            with open(path.join(rel_path,fn_tile_groups),'r') as f:
+                self.init_tile_groups(json.load(f))
+            with open(path.join(rel_path, fn_terrain_hypergraph),'r') as f:
+                raw_hypergraph = json.load(f)
+                self.hypergraph = Hypergraph(raw_hypergraph, weights=terrain_weights)
+            # Compile tile groups for vectorized tile selection
+            self.tile_index = TileIndex(self.tile_groups, self.hypergraph.terrain_codes,
+                                        self.tile_weights)
+            # Bitmasks of more than 64 terrains don't fit in the cache's arrays
+            if use_cache and self.hypergraph.missing <= 64:
+                self.cache = cache
+                self.cache_data = {'tilesets': raw_tileset_data, 'hypergraph': raw_hypergraph}
+                self.save_metadata_cache()
+        else:
+            data, arrays = cached
+            self.cache, self.cache_data = cache, data
+            self.init_tilesets(data['tilesets'])
+            self.hypergraph = Hypergraph(data['hypergraph'], compiled=False,
+                                         weights=terrain_weights)
+            self.hypergraph.compile(dict(zip(arrays['option_indices'].tolist(),
+                                             arrays['option_masks'].tolist())))
+            self.cached_options = len(self.hypergraph.option_table)
+            self.tile_index = TileIndex.from_arrays(
+                arrays['starts'], arrays['counts'], arrays['codepoints'],
+                arrays.get('weights'), arrays.get('thresholds'), arrays.get('aliases'))
+            self.tile_groups = self.tile_index.tile_groups(self.hypergraph.terrains)
+            self.tile_weights = None
+            if self.tile_index.weights is not None:
+                self.tile_weights = self.tile_index.tile_groups(self.hypergraph.terrains,
+                                                                self.tile_index.weights)
+        self.metadata_load_time = perf_counter() - start
+        self.metadata_cache_hit = cached is not None
+    def save_metadata_cache(self):
+        """
+        Writes the compiled metadata to self.cache, if there is one,
+        including the options of every neighbourhood looked up so far.
+        """
+        if self.cache is None:
+            return
+        option_masks = self.hypergraph.option_masks()
+        arrays = {'option_indices': np.array(list(option_masks.keys()), dtype=np.int64),
+                  'option_masks': np.array(list(option_masks.values()), dtype=np.uint64),
+                  'starts': self.tile_index.starts,
+                  'counts': self.tile_index.counts,
+                  'codepoints': self.tile_index.codepoints}
+        if self.tile_weights is not None:
+            arrays.update(weights=self.tile_index.weights,
+                          thresholds=self.tile_index.thresholds,
+                          aliases=self.tile_index.aliases)
+        self.cache.save(self.cache_data, arrays)
+        self.cached_options = len(option_masks)
+    def open_map(self, filename, mode='r'):
+        """
+        Opens a MapFile, checking that it was generated from the same metadata.
+        Use mode 'r+' to allow the map to be edited.
+        Raises ValueError if it wasn't.
+        """
+        map_file = MapFile(filename, mode)
+        if (map_file.terrains != self.hypergraph.terrains or
+                map_file.codepoint_base != self.codepoint_base):
+            raise ValueError('{0} was generated from different metadata'.format(filename))
+        return map_file
+    def init_geometry(self, width, height):
+        """
+        Calculates the sizes of the tile and terrain maps
+        needed to fill `width` by `height` cells,
+        and resets the scrolling offsets.
+        """
+        self.set_size(width, height)
+        # Corner Wang tiles are offset by a quarter of a tile in each dimension.
+        # Odd resolutions have the pixel at (0,0) moved by (x//2, y//2) in output tiles,
+        # So this reverse translation is correct.
+        # Scrolling changes the offset within the range [0, resolution).
+        self.scroll_x = self.resolution[0]//2
+        self.scroll_y = self.resolution[1]//2
+    def set_size(self, width, height):
+        """
+        Calculates the sizes of the tile and terrain maps
+        needed to fill `width` by `height` cells,
+        without changing the maps themselves.
+        """
+        self.terminal_width = width
+        self.terminal_height = height
         # Tiles may be offset while scrolling,
         # so one extra row and column is required
         self.tile_width = self.terminal_width+1
@@ -41,12 +254,15 @@ class Display(object):
         # so another extra row and column is required
         self.terrain_width = self.terminal_width+2
         self.terrain_height = self.terminal_height+2
-        # Select terrain values
-        self.init_terrain_map()
-        # Select tile values based on terrain values
-        self.init_tile_map()
-        # Throttle framerate
-        self.fps_limiter = FPSLimiter(fps)
+    def fit_size(self, width, height):
+        """
+        Returns the size in cells of the maps for a window of `width` by `height` cells.
+        A map file can't fill a window larger than itself,
+        so the cells past its edges are left empty.
+        """
+        if self.map_file is None:
+            return width, height
+        return min(width, self.map_file.width-1), min(height, self.map_file.height-1)
     def simplify_tile(self, tile):
         """
         Converts a full specification of a tile's location in a tileset
@@ -70,15 +286,23 @@ class Display(object):
                      {"filename": "v.g.png", "x":96,"y":96}]}
         output:
         {("g", "g", "g", "g"): [0xe000, 0xe01f]}
+        Tiles may have an optional "weight", their relative frequency (default 1).
+        If any tile has one, the weights are stored in self.tile_weights,
+        in the same format as self.tile_groups, and otherwise it is None.
         """
         self.tile_groups = {tuple(k.split('.')):self.simplify_tile_group(v)
                             for (k,v) in raw_groups.items()}
+        self.tile_weights = None
+        if any('weight' in tile for v in raw_groups.values() for tile in v):
+            self.tile_weights = {tuple(k.split('.')): [tile.get('weight', 1) for tile in v]
+                                 for (k,v) in raw_groups.items()}
     def init_tilesets(self, raw_tileset_data):
         """
         Converts the data in the `tilesets.json` metadata file
         into a format suitable for Wangview,
         stores it in self.tilesets,
         and loads tilesets into bearlibterminal.
+        See also: `open_terminal()`, `load_tileset()`
         """
         first_tileset = True
         for tileset in raw_tileset_data:
@@ -88,12 +312,9 @@ class Display(object):
                 # Use the first tileset's resolution
                 self.resolution = resolution
                 # Initialise bearlibterminal
-                blt.open()
-                config_string = "window: size=30x20, cellsize={0}x{1}, title='Wangview'".format(
-                    self.resolution[0], self.resolution[1])
-                blt.set(config_string)
+                self.open_terminal()
                 # Start tile unicode blocks in private space
-                tileset_offset_counter = 0xE000
+                tileset_offset_counter = self.codepoint_base
                 # Initialise converted metadata
                 self.tilesets = {}
                 # Only run this block once
@@ -109,94 +330,786 @@ class Display(object):
                 filename, tileset_offset_counter,
                 rx,ry, tuple(tileset['terrains']))
             # Load the tileset in bearlibterminal
-            config_string = "0x{0:x}: {1}, size={2}x{3}".format(
-                    tileset_offset_counter,
-                    path.join(self.rel_path, filename),
-                    self.resolution[0], self.resolution[1])
-            blt.set(config_string)
+            self.load_tileset(tileset_offset_counter, filename)
             # Insert the next tileset's tiles at the correct unicode codepoint
             tileset_offset_counter += rx*ry
+    def open_terminal(self):
+        """Opens the bearlibterminal window, with cells the size of one tile"""
+        blt.open()
+        config_string = ("window: size={0}x{1}, cellsize={2}x{3}, "
+                         "title='Wangview', resizeable=true").format(
+            self.window_size[0], self.window_size[1],
+            self.resolution[0], self.resolution[1])
+        blt.set(config_string)
+    def load_tileset(self, offset, filename):
+        """Loads a tileset image into bearlibterminal, starting at codepoint `offset`"""
+        config_string = "0x{0:x}: {1}, size={2}x{3}".format(
+                offset,
+                path.join(self.rel_path, filename),
+                self.resolution[0], self.resolution[1])
+        blt.set(config_string)
     def init_terrain_map(self):
         """
-        Calls Hypergraph.generate_lines
-        to generate a grid of terrain values,
-        and formats the result as a deque of deques.
-        Stores the result in self.terrain_map.
+        Calls Hypergraph.generate_lines_codes
+        to generate a grid of terrain codes,
+        or reads them from self.map_file or self.world if either is set,
+        and stores the result in self.terrain_map, a RingGrid.
         """
-        terrain_iter = self.hypergraph.generate_lines(
-            self.terrain_width, self.terrain_height)
-        terrain_deque_iter = (deque(line, self.terrain_width)
-                              for line in terrain_iter)
-        self.terrain_map = deque(terrain_deque_iter, self.terrain_height)
+        if self.map_file is not None:
+            lines = self.map_file.terrain_region(self.origin_x, self.origin_y,
+                                                 self.terrain_width, self.terrain_height)
+            if lines.shape != (self.terrain_height, self.terrain_width):
+                raise ValueError('The map is smaller than the window')
+        elif self.world is None:
+            # generate_lines_codes yields one more line than it is asked for
+            lines = list(self.hypergraph.generate_lines_codes(
+                self.terrain_width, self.terrain_height))[1:]
+        else:
+            lines = [self.hypergraph.encode_line(line) for line in
+                     self.world.terrain_region(self.origin_x, self.origin_y,
+                                               self.terrain_width, self.terrain_height)]
+        self.terrain_map = RingGrid.from_lines(lines)
     def init_tile_map(self):
         """
         Generates a grid of unicode codepoints specifying graphical tiles,
         conforming to the current grid of terrain values,
-        and formats it as a deque of deques.
-        Stores the result in self.tile_map.
-        """
-        tile_iter = ((self.select_tile(self.get_tile_corners(x,y))
-                      for x in range(self.tile_width))
-                     for y in range(self.tile_height))
-        tile_deque_iter = (deque(line, self.tile_width) for line in tile_iter)
-        self.tile_map = deque(tile_deque_iter, self.tile_height)
+        and stores it in self.tile_map, a RingGrid.
+        Every tile is selected at once by self.tile_index;
+        `select_tile` gives the same result for a single tile.
+        If self.map_file or self.world is set, the tiles are read from it instead.
+        """
+        if self.map_file is not None:
+            lines = self.map_file.tile_region(self.origin_x, self.origin_y,
+                                              self.tile_width, self.tile_height)
+        elif self.world is None:
+            lines = self.tile_index.select(self.terrain_map.to_array(), self.rng)
+        else:
+            lines = self.world.tile_region(
+                self.origin_x, self.origin_y,
+                self.tile_width, self.tile_height)
+        self.tile_map = RingGrid.from_lines(lines)
+        self.mark_all_dirty()
+    def set_maps(self, terrain_lines, tile_lines):
+        """Replaces the terrain and tile maps with lines of terrain codes and tiles"""
+        self.terrain_map = RingGrid.from_lines(terrain_lines)
+        self.tile_map = RingGrid.from_lines(tile_lines)
+        self.mark_all_dirty()
+    def request_scene(self):
+        """
+        Starts generating the next scene in self.scene_worker,
+        from a random seed.
+        If self.world is set, the scene is the current view of a new world.
+        """
+        origin = None if self.world is None else (self.origin_x, self.origin_y)
+        self.scene_worker.submit(self.tile_width, self.tile_height,
+                                 random.getrandbits(32), origin)
+    def new_scene(self):
+        """
+        Replaces the scene with a new one,
+        or a new world from a random seed if self.world is set.
+        With a scene worker, the scene is replaced by `flip_scene`
+        once the worker has finished it, instead of being generated immediately.
+        A map read from self.map_file can't be replaced.
+        """
+        if self.map_file is not None:
+            return
+        if self.scene_worker is None:
+            start = perf_counter()
+            if self.world is not None:
+                self.world.reseed(random.getrandbits(32))
+            self.init_terrain_map()
+            self.init_tile_map()
+            self.scene_count += 1
+            self.scene_generation_time = perf_counter() - start
+        else:
+            self.flip_pending = True
+            self.flip_scene()
+    def flip_scene(self):
+        """
+        If a new scene is wanted and the scene worker has finished one,
+        swaps it in, and starts generating the next.
+        A world scene also moves the view back to where it was requested.
+        Returns True if the scene was replaced.
+        """
+        if not self.flip_pending or not self.scene_worker.ready():
+            return False
+        (width, height, seed, origin), (terrain, tiles) = self.scene_worker.take()
+        if (width, height) == (self.tile_width, self.tile_height):
+            if self.world is not None:
+                self.world.reseed(seed)
+                self.origin_x, self.origin_y = origin
+            self.set_maps(terrain, tiles)
+            self.flip_pending = False
+            self.scene_count += 1
+            self.scene_generation_time = self.scene_worker.generation_time
+        # A scene of the wrong size is discarded
+        self.request_scene()
+        return not self.flip_pending
+    def brush_corners(self, x, y):
+        """
+        Returns the set of positions in the terrain map of the terrain values
+        covered by the brush when it is centred on the value at (x, y).
+        Values on the edges of the terrain map are never covered,
+        so every tile they are a corner of is in the tile map.
+        """
+        r = self.brush_radius
+        circle = self.brush_shape == 'circle'
+        return {(cx, cy)
+                for cy in range(max(1, y-r), min(self.terrain_height-1, y+r+1))
+                for cx in range(max(1, x-r), min(self.terrain_width-1, x+r+1))
+                if not circle or (cx-x)**2 + (cy-y)**2 <= r*r}
+    def reroll(self, x, y):
+        """
+        Replaces the terrain covered by the brush centred on the terrain value at (x, y),
+        and the tiles it is a corner of.
+        The terrain is resampled subject to the terrain around it on every side
+        (see `Hypergraph.fill_region`), and only the tiles with a resampled corner
+        are selected again and redrawn,
+        so the cost depends on the size of the brush and not of the maps.
+        If self.map_file is set, the changes are written to it,
+        or nothing is changed if it isn't open for editing,
+        and if self.world is set, they are written to its chunks.
+        Elsewhere the changes are only kept while they are in view.
+        Returns False if nothing was changed.
+        """
+        if self.map_file is not None and not self.map_file.terrain.flags.writeable:
+            return False
+        free = self.brush_corners(x, y)
+        if not free:
+            return False
+        # The free terrain values and the fixed values around them
+        x0 = min(cx for (cx, cy) in free)-1
+        y0 = min(cy for (cx, cy) in free)-1
+        x1 = max(cx for (cx, cy) in free)+1
+        y1 = max(cy for (cx, cy) in free)+1
+        grid = [[None if (cx, cy) in free else self.terrain_map[cy, cx]
+                 for cx in range(x0, x1+1)]
+                for cy in range(y0, y1+1)]
+        try:
+            self.hypergraph.fill_region(grid, random, self.brush_backtracks)
+        except IndexError:
+            return False
+        for (cx, cy) in free:
+            self.terrain_map[cy, cx] = grid[cy-y0][cx-x0]
+        changed = {t for (cx, cy) in free for t in product((cx-1, cx), (cy-1, cy))}
+        for (tx, ty) in changed:
+            self.tile_map[ty, tx] = self.select_tile(self.get_tile_corners(tx, ty))
+            self.mark_dirty(tx, ty)
+        if self.map_file is not None:
+            for (cx, cy) in free:
+                self.map_file.terrain[self.origin_y+cy, self.origin_x+cx] = \
+                    self.terrain_map[cy, cx]
+            for (tx, ty) in changed:
+                self.map_file.tiles[self.origin_y+ty, self.origin_x+tx] = self.tile_map[ty, tx]
+            self.terrain_changed(self.origin_x+x0+1, self.origin_y+y0+1, x1-x0-1, y1-y0-1)
+        if self.world is not None:
+            for (cx, cy) in free:
+                self.world.set_terrain(self.origin_x+cx, self.origin_y+cy,
+                                       self.hypergraph.terrains[self.terrain_map[cy, cx]])
+            for (tx, ty) in changed:
+                self.world.set_tile(self.origin_x+tx, self.origin_y+ty, self.tile_map[ty, tx])
+        return True
+    def mouse_corner(self):
+        """
+        Returns the position in the terrain map of the terrain value nearest the mouse.
+        Terrain values are at the corners of tiles,
+        so the value at (x, y) is drawn at the top left of the tile at (x, y).
+        """
+        rw, rh = self.resolution
+        return ((blt.state(blt.TK_MOUSE_PIXEL_X) + self.scroll_x + rw//2)//rw,
+                (blt.state(blt.TK_MOUSE_PIXEL_Y) + self.scroll_y + rh//2)//rh)
+    def brush(self):
+        """
+        Re-rolls the brush around the terrain value nearest the mouse,
+        unless it was the last one re-rolled.
+        """
+        position = self.mouse_corner()
+        if position != self.brush_position:
+            self.brush_position = position
+            with self.profiler.stage('regenerate'):
+                self.reroll(*position)
     def get_tile_corners(self, x, y):
         """
         Returns a generator which iterates over the terrain values in positions
         [(x,y), (x,y+1), (x+1, y), (x+1, y+1)]
         """
-        return (self.terrain_map[y][x]
+        return (self.hypergraph.terrains[self.terrain_map[y, x]]
                 for (x,y) in
                 product((x,x+1),(y,y+1)))
     def select_tile(self, corners):
-        """Selects a random tile that has the specified terrain values in its corners"""
-        return random.choice(self.tile_groups[tuple(corners)])
+        """
+        Selects a random tile that has the specified terrain values in its corners.
+        Weighted tiles are sampled from their group's alias table.
+        """
+        if self.tile_index.thresholds is None:
+            return random.choice(self.tile_groups[tuple(corners)])
+        return self.tile_index.sample(
+            tuple(self.hypergraph.terrain_codes[t] for t in corners))
+    def new_column(self, x, edge, right):
+        """
+        Returns a new column of terrain codes and a new column of tiles
+        to be added beside `edge`, the terrain column on the right or left
+        edge of the terrain map, where `x` is the new tile column's world coordinate.
+        Adjacency constraints are symmetric,
+        so `Hypergraph.generate_line_codes` can extend a map in any direction
+        by treating the edge column or row as the previous line.
+        """
+        if self.map_file is not None:
+            terrain_x = x+1 if right else x
+            return (self.map_file.terrain_region(terrain_x, self.origin_y,
+                                                 1, self.terrain_height)[:, 0],
+                    self.map_file.tile_region(x, self.origin_y, 1, self.tile_height)[:, 0])
+        if self.world is not None:
+            terrain_x = x+1 if right else x
+            new_terrain = [self.hypergraph.terrain_codes[line[0]]
+                           for line in self.world.terrain_region(
+                               terrain_x, self.origin_y, 1, self.terrain_height)]
+            new_tiles = [line[0] for line in self.world.tile_region(
+                x, self.origin_y, 1, self.tile_height)]
+            return new_terrain, new_tiles
+        new_terrain = self.hypergraph.generate_line_codes(self.terrain_height, edge.tolist())
+        pair = (edge, new_terrain) if right else (new_terrain, edge)
+        new_tiles = self.tile_index.select(np.array(pair).T, self.rng)[:, 0]
+        return new_terrain, new_tiles
+    def new_row(self, y, edge, down):
+        """
+        Returns a new row of terrain codes and a new row of tiles
+        to be added beside `edge`, the terrain row on the bottom or top
+        edge of the terrain map, where `y` is the new tile row's world coordinate.
+        """
+        if self.map_file is not None:
+            terrain_y = y+1 if down else y
+            return (self.map_file.terrain_region(self.origin_x, terrain_y,
+                                                 self.terrain_width, 1)[0],
+                    self.map_file.tile_region(self.origin_x, y, self.tile_width, 1)[0])
+        if self.world is not None:
+            terrain_y = y+1 if down else y
+            new_terrain = self.hypergraph.encode_line(self.world.terrain_region(
+                self.origin_x, terrain_y, self.terrain_width, 1)[0])
+            new_tiles = self.world.tile_region(
+                self.origin_x, y, self.tile_width, 1)[0]
+            return new_terrain, new_tiles
+        new_terrain = self.hypergraph.generate_line_codes(self.terrain_width, edge.tolist())
+        pair = (edge, new_terrain) if down else (new_terrain, edge)
+        new_tiles = self.tile_index.select(np.array(pair), self.rng)[0]
+        return new_terrain, new_tiles
+    def extend_right(self):
+        """
+        Scrolls the maps one tile to the right,
+        adding one new column of terrain and tiles on the right edge.
+        """
+        self.origin_x += 1
+        edge = self.terrain_map.column(-1)
+        new_terrain, new_tiles = self.new_column(
+            self.origin_x+self.tile_width-1, edge, True)
+        # Pushing onto one edge drops the column on the opposite edge
+        self.terrain_map.push_right(new_terrain)
+        self.tile_map.push_right(new_tiles)
+    def extend_left(self):
+        """
+        Scrolls the maps one tile to the left,
+        adding one new column of terrain and tiles on the left edge.
+        """
+        self.origin_x -= 1
+        edge = self.terrain_map.column(0)
+        new_terrain, new_tiles = self.new_column(self.origin_x, edge, False)
+        self.terrain_map.push_left(new_terrain)
+        self.tile_map.push_left(new_tiles)
+    def extend_down(self):
+        """
+        Scrolls the maps one tile down,
+        adding one new row of terrain and tiles on the bottom edge.
+        """
+        self.origin_y += 1
+        edge = self.terrain_map.row(-1)
+        new_terrain, new_tiles = self.new_row(
+            self.origin_y+self.tile_height-1, edge, True)
+        self.terrain_map.push_down(new_terrain)
+        self.tile_map.push_down(new_tiles)
+    def extend_up(self):
+        """
+        Scrolls the maps one tile up,
+        adding one new row of terrain and tiles on the top edge.
+        """
+        self.origin_y -= 1
+        edge = self.terrain_map.row(0)
+        new_terrain, new_tiles = self.new_row(self.origin_y, edge, False)
+        self.terrain_map.push_up(new_terrain)
+        self.tile_map.push_up(new_tiles)
+    def resize(self, width, height):
+        """
+        Starts resizing the maps to fill a window of `width` by `height` cells.
+        The maps are resized over the following frames by `step_resize`.
+        """
+        self.target_size = self.fit_size(width, height)
+    def step_resize(self):
+        """
+        Moves the size of the maps one step towards self.target_size.
+        Rows and columns which no longer fit are trimmed at once,
+        but new ones are added at most self.resize_budget terrain values at a time,
+        columns first, so that growing a large window doesn't stall a frame.
+        A map file is read again instead, since nothing needs to be generated.
+        Returns True if the maps were changed.
+        """
+        width, height = self.target_size
+        if (width, height) == (self.terminal_width, self.terminal_height):
+            return False
+        if self.map_file is not None:
+            self.set_size(width, height)
+            # Keep the whole view inside the map
+            self.origin_x = min(self.origin_x, self.map_file.width - self.tile_width)
+            self.origin_y = min(self.origin_y, self.map_file.height - self.tile_height)
+            self.init_terrain_map()
+            self.init_tile_map()
+            return True
+        if width < self.terminal_width or height < self.terminal_height:
+            self.set_size(min(width, self.terminal_width), min(height, self.terminal_height))
+            for grid, grid_width, grid_height in (
+                    (self.terrain_map, self.terrain_width, self.terrain_height),
+                    (self.tile_map, self.tile_width, self.tile_height)):
+                grid.resize(grid_width, grid_height)
+        elif width > self.terminal_width:
+            self.grow_right(min(width - self.terminal_width,
+                                max(1, self.resize_budget//self.terrain_height)))
+        else:
+            self.grow_down(min(height - self.terminal_height,
+                               max(1, self.resize_budget//self.terrain_width)))
+        self.mark_all_dirty()
+        return True
+    def grow_right(self, count):
+        """
+        Widens the maps by `count` columns,
+        each generated from the column before it like `extend_right`.
+        """
+        first = self.tile_width
+        self.set_size(self.terminal_width+count, self.terminal_height)
+        self.terrain_map.resize(self.terrain_width, self.terrain_height)
+        self.tile_map.resize(self.tile_width, self.tile_height)
+        for x in range(first, self.tile_width):
+            # Terrain column x is the left edge of tile column x
+            new_terrain, new_tiles = self.new_column(
+                self.origin_x+x, self.terrain_map.column(x), True)
+            self.terrain_map.set_column(x+1, new_terrain)
+            self.tile_map.set_column(x, new_tiles)
+    def grow_down(self, count):
+        """
+        Heightens the maps by `count` rows,
+        each generated from the row before it like `extend_down`.
+        """
+        first = self.tile_height
+        self.set_size(self.terminal_width, self.terminal_height+count)
+        self.terrain_map.resize(self.terrain_width, self.terrain_height)
+        self.tile_map.resize(self.tile_width, self.tile_height)
+        for y in range(first, self.tile_height):
+            new_terrain, new_tiles = self.new_row(
+                self.origin_y+y, self.terrain_map.row(y), True)
+            self.terrain_map.set_row(y+1, new_terrain)
+            self.tile_map.set_row(y, new_tiles)
+    def pan(self, dx, dy):
+        """
+        Moves the view by (dx, dy) pixels.
+        Whenever the offset passes a whole tile,
+        the maps are extended by one row or column in that direction.
+        The view stays inside the map if self.map_file is set.
+        While zoomed out, see `pan_overview`.
+        """
+        if self.zoom:
+            self.pan_overview(dx, dy)
+            return
+        if self.map_file is not None:
+            dx, dy = self.clamp_pan(dx, dy)
+        if dx or dy:
+            # Every tile moves
+            self.mark_all_dirty()
+        self.scroll_x += dx
+        self.scroll_y += dy
+        with self.profiler.stage('regenerate'):
+            while self.scroll_x >= self.resolution[0]:
+                self.scroll_x -= self.resolution[0]
+                self.extend_right()
+            while self.scroll_x < 0:
+                self.scroll_x += self.resolution[0]
+                self.extend_left()
+            while self.scroll_y >= self.resolution[1]:
+                self.scroll_y -= self.resolution[1]
+                self.extend_down()
+            while self.scroll_y < 0:
+                self.scroll_y += self.resolution[1]
+                self.extend_up()
+    def pan_overview(self, dx, dy):
+        """
+        Moves the view by (dx, dy) pixels of the zoomed out view,
+        which are 2**self.zoom pixels of the map.
+        The maps aren't extended, since they aren't drawn,
+        so they are read again when zooming back in.
+        """
+        scale = 2**self.zoom
+        dx, dy = self.clamp_pan(dx*scale, dy*scale)
+        if not (dx or dy):
+            return
+        rw, rh = self.resolution
+        self.origin_x, self.scroll_x = divmod(self.origin_x*rw + self.scroll_x + dx, rw)
+        self.origin_y, self.scroll_y = divmod(self.origin_y*rh + self.scroll_y + dy, rh)
+        self.view_stale = True
+        self.mark_all_dirty()
+    def clamp_pan(self, dx, dy):
+        """
+        Returns the part of a movement of (dx, dy) pixels
+        which keeps every tile in the view inside self.map_file.
+        """
+        rw, rh = self.resolution
+        x = self.origin_x*rw + self.scroll_x
+        y = self.origin_y*rh + self.scroll_y
+        # The last tile column and row are only partly visible
+        max_x = (self.map_file.width - self.tile_width)*rw + rw - 1
+        max_y = (self.map_file.height - self.tile_height)*rh + rh - 1
+        return (max(0, min(max_x, x+dx)) - x if max_x >= 0 else 0,
+                max(0, min(max_y, y+dy)) - y if max_y >= 0 else 0)
+    def overview_pyramid(self):
+        """
+        Returns the TerrainPyramid of self.map_file's terrain,
+        building it and the terrain swatches on the first call,
+        or None if there is no map file to give an overview of.
+        A terrain's swatch is its tile with that terrain in every corner,
+        used as a cell of solid colour.
+        """
+        if self.map_file is None:
+            return None
+        if self.pyramid is None:
+            self.pyramid = TerrainPyramid(self.map_file.terrain)
+            # The last swatch is blank, for cells outside the map (-1)
+            self.swatches = np.array([self.tile_groups.get((t,)*4, [0])[0]
+                                      for t in self.hypergraph.terrains] + [0],
+                                     dtype=np.int32)
+        return self.pyramid
+    def set_zoom(self, zoom):
+        """
+        Zooms out to a level of the overview pyramid, or back in to the tiles at 0.
+        Does nothing without a map file.
+        """
+        pyramid = self.overview_pyramid()
+        if pyramid is None:
+            return
+        zoom = max(0, min(zoom, len(pyramid)-1))
+        if zoom == self.zoom:
+            return
+        if zoom == 0 and self.view_stale:
+            with self.profiler.stage('regenerate'):
+                self.init_terrain_map()
+                self.init_tile_map()
+            self.view_stale = False
+        self.zoom = zoom
+        self.mark_all_dirty()
+    def terrain_changed(self, x, y, width, height):
+        """
+        Updates the overview after the terrain of self.map_file has changed
+        in the `width` by `height` region with top left corner (x, y).
+        """
+        if self.pyramid is not None:
+            self.pyramid.update(x, y, width, height)
+            if self.zoom or self.show_minimap:
+                self.mark_all_dirty()
+    def mark_dirty(self, x, y):
+        """
+        Marks the tile at (x, y) in the tile map to be redrawn,
+        and updates its entry in the draw list.
+        """
+        self.dirty_tiles.add((x, y))
+        if self.draw_list is not None:
+            i = y*self.tile_width + x
+            self.draw_list[i] = self.draw_list[i][:4] + (self.tile_map[y, x],)
+        if self.row_list is not None and x < self.tile_width-1:
+            # Rebuilt by the next `draw_rows`
+            self.row_list[y] = None
+    def mark_all_dirty(self):
+        """
+        Marks every tile to be redrawn,
+        and discards the draw lists so that they are rebuilt on the next draw.
+        """
+        self.all_dirty = True
+        self.dirty_tiles.clear()
+        self.draw_list = None
+        self.row_list = None
+    def tile_cell(self, x, y):
+        """Returns the terminal cell where the tile at (x, y) is put"""
+        return (min(x, self.tile_width-2), min(y, self.tile_height-2))
+    def cell_draw_iter(self, cell_x, cell_y):
+        """Yields the draw arguments of every tile put in one terminal cell"""
+        ys = [cell_y, cell_y+1] if cell_y == self.tile_height-2 else [cell_y]
+        xs = [cell_x, cell_x+1] if cell_x == self.tile_width-2 else [cell_x]
+        for y in ys:
+            dy = -self.scroll_y + (self.resolution[1] if y == self.tile_height-1 else 0)
+            for x in xs:
+                dx = -self.scroll_x + (self.resolution[0] if x == self.tile_width-1 else 0)
+                yield (cell_x, cell_y, dx, dy, self.tile_map[y, x])
     def draw_iter(self):
         """Yields cell coordinates, offset, and character for each tile to be drawn"""
-        for y, line in enumerate(self.tile_map):
-            # Corner Wang tiles are offset by a quarter of a tile in each dimension.
-            # Odd resolutions have the pixel at (0,0) moved by (x//2, y//2) in output tiles,
-            # So this reverse translation is correct.
-            dy = -(self.resolution[1]//2)
+        for y, line in enumerate(self.tile_map.tolist()):
+            dy = -self.scroll_y
             if y == self.tile_height-1:
                 # The terminal ignores characters put outside its range,
                 # so one row must be drawn using composition
                 y -= 1
                 dy += self.resolution[1]
             for x, c in enumerate(line):
-                dx = -(self.resolution[0]//2)
+                dx = -self.scroll_x
                 if x == self.tile_width-1:
                     # One column must also be drawn using composition
                     x -= 1
                     dx += self.resolution[0]
                 yield (x,y,dx,dy,c)
+    def row_text(self, y):
+        """
+        Returns the text which draws row `y` of the tile map, except for its last tile.
+        Like the last column, the last row is put in the row of cells before it,
+        using an offset.
+        """
+        dy = -self.scroll_y + (self.resolution[1] if y == self.tile_height-1 else 0)
+        return self.renderer.row_text(-self.scroll_x, dy,
+                                      self.tile_map.row(y)[:-1].tolist())
+    def draw_rows(self):
+        """
+        Draws every tile with one call per row of tiles,
+        and one call per tile in the last column,
+        which can't be drawn as text since it shares cells with the column before it.
+        The text of each row is cached in self.row_list.
+        """
+        renderer = self.renderer
+        if self.row_list is None:
+            self.row_list = [None]*self.tile_height
+        last_x = self.tile_width-2
+        last_y = self.tile_height-2
+        for y, text in enumerate(self.row_list):
+            if text is None:
+                text = self.row_list[y] = self.row_text(y)
+            renderer.put_row(0, min(y, last_y), text)
+        dx = -self.scroll_x + self.resolution[0]
+        for y, c in enumerate(self.tile_map.column(-1).tolist()):
+            dy = -self.scroll_y + (self.resolution[1] if y > last_y else 0)
+            renderer.put(last_x, min(y, last_y), dx, dy, c)
     def draw(self):
         """
-        Draws every tile to the terminal.
-        See also: `draw_iter.`
+        Draws the tiles which have changed since the last call to the terminal.
+        If every tile is dirty, the terminal is cleared and every tile is drawn,
+        a row at a time with `draw_rows` if self.batch_rows is set,
+        and otherwise one tile at a time from self.draw_list.
+        Otherwise only the cells containing dirty tiles are cleared and redrawn.
+        Returns False if nothing needed to be drawn.
+        While zoomed out, `draw_overview` is drawn instead.
+        See also: `draw_iter`, `draw_list`.
+        """
+        if self.zoom:
+            return self.draw_overview()
+        stage = self.profiler.stage
+        renderer = self.renderer
+        if self.all_dirty:
+            if not self.batch_rows and self.draw_list is None:
+                with stage('draw'):
+                    # Rebuilt only after the tile map or the offsets change
+                    self.draw_list = list(self.draw_iter())
+            with stage('clear'):
+                renderer.clear()
+            with stage('draw'):
+                if self.batch_rows:
+                    self.draw_rows()
+                else:
+                    put = renderer.put
+                    for draw_args in self.draw_list:
+                        put(*draw_args)
+        elif self.dirty_tiles:
+            cells = {self.tile_cell(x, y) for (x, y) in self.dirty_tiles}
+            with stage('clear'):
+                for cell in cells:
+                    renderer.clear_area(cell[0], cell[1], 1, 1)
+            with stage('draw'):
+                for cell in cells:
+                    for draw_args in self.cell_draw_iter(*cell):
+                        renderer.put(*draw_args)
+        else:
+            return False
+        self.all_dirty = False
+        self.dirty_tiles.clear()
+        return True
+    def overview_region(self, level, width, height):
+        """
+        Returns the swatches of the `width` by `height` region of a pyramid level
+        centred on the view, as a list of lines of codepoints, where 0 is blank.
+        """
+        size = 2**level
+        # Terrain coordinates of the centre of the view
+        x = self.origin_x + self.tile_width//2
+        y = self.origin_y + self.tile_height//2
+        region = self.pyramid.region(level, x//size - width//2, y//size - height//2,
+                                     width, height)
+        return self.swatches[region].tolist()
+    def draw_overview(self):
+        """
+        Draws the zoomed out view, one swatch per cell of pyramid level self.zoom,
+        so that the cost only depends on the size of the terminal.
+        Returns False if nothing needed to be drawn.
         """
-        for draw_args in self.draw_iter():
-            blt.put_ext(*draw_args)
-    def run(self):
+        if not self.all_dirty:
+            self.dirty_tiles.clear()
+            return False
+        stage = self.profiler.stage
+        renderer = self.renderer
+        with stage('clear'):
+            renderer.clear()
+        with stage('draw'):
+            lines = self.overview_region(self.zoom, self.terminal_width, self.terminal_height)
+            for y, line in enumerate(lines):
+                renderer.put_row(0, y, renderer.row_text(0, 0, line))
+        self.all_dirty = False
+        self.dirty_tiles.clear()
+        return True
+    def draw_minimap(self):
+        """
+        Draws the lowest pyramid level that fits in self.minimap_size
+        in the top right corner of the overlay layer,
+        with a cross on the cell containing the centre of the view.
+        """
+        with self.profiler.stage('draw'):
+            width = min(self.minimap_size[0], self.terminal_width)
+            height = min(self.minimap_size[1], self.terminal_height)
+            level = self.pyramid.level_for(width, height)
+            left = self.terminal_width - width
+            renderer = self.renderer
+            renderer.layer(self.overlay_layer)
+            renderer.clear_area(left, 0, width, height)
+            # The whole level fits, so it is drawn from its top left corner
+            level_height, level_width = self.pyramid.shape(level)
+            lines = self.swatches[self.pyramid.region(level, 0, 0, width, height)].tolist()
+            for y, line in enumerate(lines):
+                renderer.put_row(left, y, renderer.row_text(0, 0, line))
+            size = 2**level
+            renderer.put(left + min((self.origin_x + self.tile_width//2)//size, level_width-1),
+                         min((self.origin_y + self.tile_height//2)//size, level_height-1),
+                         0, 0, ord('+'))
+            renderer.layer(0)
+    def draw_profile(self):
+        """Prints the frame statistics from self.profiler on the overlay layer"""
+        renderer = self.renderer
+        with self.profiler.stage('draw'):
+            renderer.layer(self.overlay_layer)
+            renderer.clear_area(0, 0, self.tile_width, self.tile_height)
+            for y, line in enumerate(self.profiler.summary_lines()):
+                renderer.text(0, y, line)
+            renderer.layer(0)
+    def handle_input(self):
+        """
+        Handles every pending input event, then pans the view for held arrow keys.
+        Returns True if the window should be closed.
+        """
+        stage = self.profiler.stage
+        stop = False
+        while blt.has_input():
+            kp = blt.read()
+            if kp == blt.TK_CLOSE:
+                stop = True
+            elif kp == blt.TK_ESCAPE:
+                stop = True
+            elif kp == blt.TK_RESIZED:
+                self.resize(blt.state(blt.TK_WIDTH), blt.state(blt.TK_HEIGHT))
+            elif kp == blt.TK_SPACE:
+                with stage('regenerate'):
+                    self.new_scene()
+            elif kp == blt.TK_F1:
+                self.show_profile = not self.show_profile
+                # Clearing the whole terminal also clears the overlay layer
+                self.mark_all_dirty()
+            elif kp == blt.TK_M and self.overview_pyramid() is not None:
+                self.show_minimap = not self.show_minimap
+                self.mark_all_dirty()
+            elif kp == blt.TK_MINUS:
+                self.set_zoom(self.zoom+1)
+            elif kp == blt.TK_EQUALS:
+                self.set_zoom(self.zoom-1)
+            elif kp == blt.TK_MOUSE_LEFT:
+                self.drag_position = (blt.state(blt.TK_MOUSE_PIXEL_X),
+                                      blt.state(blt.TK_MOUSE_PIXEL_Y))
+            elif kp == blt.TK_MOUSE_LEFT|blt.TK_KEY_RELEASED:
+                self.drag_position = None
+            elif kp == blt.TK_MOUSE_MOVE and self.drag_position is not None:
+                x = blt.state(blt.TK_MOUSE_PIXEL_X)
+                y = blt.state(blt.TK_MOUSE_PIXEL_Y)
+                # Dragging moves the scene with the mouse
+                self.pan(self.drag_position[0]-x, self.drag_position[1]-y)
+                self.drag_position = (x, y)
+            elif kp == blt.TK_MOUSE_RIGHT and not self.zoom:
+                self.brush_position = None
+                self.brush()
+            elif kp == blt.TK_MOUSE_RIGHT|blt.TK_KEY_RELEASED:
+                self.brush_position = None
+            elif (kp == blt.TK_MOUSE_MOVE and self.brush_position is not None
+                  and not self.zoom):
+                # Holding the right button paints with the brush
+                self.brush()
+            elif kp == blt.TK_MOUSE_SCROLL:
+                self.brush_radius = max(0, self.brush_radius - blt.state(blt.TK_MOUSE_WHEEL))
+            elif kp == blt.TK_TAB:
+                i = self.brush_shapes.index(self.brush_shape)
+                self.brush_shape = self.brush_shapes[(i+1) % len(self.brush_shapes)]
+        # Held arrow keys pan continuously
+        self.pan(self.scroll_speed*(blt.state(blt.TK_RIGHT)-blt.state(blt.TK_LEFT)),
+                 self.scroll_speed*(blt.state(blt.TK_DOWN)-blt.state(blt.TK_UP)))
+        return stop
+    def run(self, autopilot=None):
         """
         Draws the scene to the terminal and refreshes repeatedly.
         Quits on pressing Esc or closing the window.
-        Creates a new scene on pressing Space.
+        Creates a new scene on pressing Space,
+        or a new world from a random seed if self.world is set;
+        if self.background_regeneration is set,
+        scenes are generated ahead of time by a SceneWorker.
+        Pans the view while arrow keys are held or the mouse is dragged.
+        Shows or hides frame statistics on pressing F1.
+        Resizes the maps to fit the window when it is resized.
+        Re-rolls the terrain around the mouse while the right button is held;
+        the mouse wheel changes the size of the brush, and Tab its shape.
+        If self.map_file is set, zooms out and in on pressing - and =,
+        and shows or hides a minimap on pressing M.
+        If `autopilot` is given, it also pans the view and replaces scenes,
+        and stops the loop when it is finished; see Autopilot.
         """
         stop = False
         blt.composition(True)
+        # Mouse movement events are needed for dragging
+        blt.set('input: filter=[keyboard, mouse]')
+        if self.background_regeneration and self.map_file is None:
+            self.scene_worker = SceneWorker(self.hypergraph, self.tile_index, self.tile_groups,
+                                            *(() if self.world is None else
+                                              (self.world.chunk_size,)))
+            self.request_scene()
+        stage = self.profiler.stage
         while not stop:
-            self.fps_limiter.wait()
-            blt.clear()
-            self.draw()
-            blt.refresh()
-            while blt.has_input():
-                kp = blt.read()
-                if kp == blt.TK_CLOSE:
-                    stop = True
-                elif kp == blt.TK_ESCAPE:
-                    stop = True
-                elif kp == blt.TK_SPACE:
-                    self.init_terrain_map()
-                    self.init_tile_map()
+            self.profiler.begin_frame()
+            with stage('wait'):
+                self.fps_limiter.wait()
+            with stage('regenerate'):
+                self.flip_scene()
+                self.step_resize()
+            # An unchanged scene doesn't need to be drawn or refreshed,
+            # unless the statistics are shown
+            drawn = self.draw()
+            if self.show_profile:
+                self.draw_profile()
+                drawn = True
+            # The minimap is cleared with the terminal, and drawn over the statistics
+            if self.show_minimap and drawn:
+                self.draw_minimap()
+            if drawn:
+                with stage('refresh'):
+                    blt.refresh()
+            with stage('input'):
+                stop = self.handle_input()
+                if autopilot is not None:
+                    stop = autopilot.step() or stop
+            self.profiler.end_frame()
+        if self.scene_worker is not None:
+            self.scene_worker.close()
+            self.scene_worker = None
+        # Keep the options computed while running for the next start
+        if self.cache is not None and len(self.hypergraph.option_table) > self.cached_options:
+            self.save_metadata_cache()
+        self.profiler.close()
         blt.close()
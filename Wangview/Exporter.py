@@ -0,0 +1,127 @@
+
+# coding: utf-8
+
+# In[ ]:
+
+from os import path
+from time import perf_counter
+import numpy as np
+from PIL import Image
+from .Display import Display
+from .ArrayEngine import ArrayEngine
+from .Hypergraph import parse_weights
+from .PNGWriter import PNGWriter
+
+
+# In[ ]:
+
+class Exporter(Display):
+    """
+    Renders maps of any size to PNG files without opening a terminal,
+    reusing Display's metadata parsing and tile placement.
+    Terrain and tiles are generated and composited in horizontal strips,
+    so peak memory depends on the strip height, not the map height.
+    """
+    def __init__(self,
+                 rel_path='.',
+                 fn_tile_groups='tile_groups.json',
+                 fn_terrain_hypergraph='terrain_hypergraph.json',
+                 fn_tileset_data='tilesets.json',
+                 terrain_weights=None):
+        # Decoded tileset images, keyed by their first codepoint
+        self.tileset_images = {}
+        self.init_metadata(rel_path, fn_tile_groups,
+                           fn_terrain_hypergraph, fn_tileset_data,
+                           terrain_weights=terrain_weights)
+        # Every tile's pixels, indexed by codepoint - codepoint_base
+        self.atlas = np.concatenate([self.tileset_images[offset]
+                                     for offset in sorted(self.tileset_images)])
+        self.engine = ArrayEngine(self.hypergraph)
+    def open_terminal(self):
+        """No terminal is needed for exporting"""
+        pass
+    def load_tileset(self, offset, filename):
+        """Decodes a tileset image once, and splits it into tiles"""
+        rw, rh = self.resolution
+        tileset = self.tilesets[filename]
+        image = Image.open(path.join(self.rel_path, filename)).convert('RGBA')
+        pixels = np.asarray(image)[:tileset.height*rh, :tileset.width*rw]
+        # Tiles are numbered row by row, like their codepoints
+        self.tileset_images[offset] = (
+            pixels.reshape(tileset.height, rh, tileset.width, rw, 4)
+                  .transpose(0, 2, 1, 3, 4)
+                  .reshape(tileset.height*tileset.width, rh, rw, 4))
+    def iter_strips(self, width, height, seed=None, strip_height=4):
+        """
+        Yields the pixels of a new `width` by `height` tile map,
+        as uint8 arrays of shape (rows, width*resolution[0], 4),
+        from the top of the image to the bottom.
+        Each strip covers at most `strip_height` rows of tiles.
+        """
+        self.init_geometry(width, height)
+        rw, rh = self.resolution
+        # Separate generators keep the output independent of `strip_height`
+        terrain_rng, tile_rng = map(np.random.default_rng,
+                                    np.random.SeedSequence(seed).spawn(2))
+        terrain_rows = self.engine.iter_rows(
+            self.terrain_width, self.terrain_height, terrain_rng)
+        previous_row = next(terrain_rows)
+        # Tiles are drawn offset by (-scroll_x, -scroll_y) pixels, as in `draw_iter`
+        skip = self.scroll_y
+        remaining = height*rh
+        while remaining > 0:
+            terrain = [previous_row]
+            for row in terrain_rows:
+                terrain.append(row)
+                if len(terrain) > strip_height:
+                    break
+            previous_row = terrain[-1]
+            tiles = self.tile_index.select(np.array(terrain), tile_rng)
+            pixels = (self.atlas[tiles - self.codepoint_base]
+                      .transpose(0, 2, 1, 3, 4)
+                      .reshape(len(tiles)*rh, self.tile_width*rw, 4)
+                      [skip:skip+remaining, self.scroll_x:self.scroll_x+width*rw])
+            skip = 0
+            remaining -= len(pixels)
+            yield pixels
+    def export(self, filename, width, height, seed=None, strip_height=4):
+        """
+        Writes a new `width` by `height` tile map to the PNG file `filename`.
+        Returns a dict of the image size, the elapsed time,
+        and the throughput in megapixels per second.
+        """
+        start = perf_counter()
+        rw, rh = self.resolution
+        with open(filename, 'wb') as f:
+            writer = PNGWriter(f, width*rw, height*rh)
+            for pixels in self.iter_strips(width, height, seed, strip_height):
+                writer.write_rows(pixels)
+            writer.close()
+        elapsed = perf_counter() - start
+        megapixels = width*rw*height*rh/1e6
+        return {'width': width*rw,
+                'height': height*rh,
+                'seconds': elapsed,
+                'megapixels_per_second': megapixels/elapsed}
+
+
+# In[ ]:
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Export a random Wangscape map to a PNG file')
+    parser.add_argument('path', help='Wangscape output directory')
+    parser.add_argument('output', help='PNG file to write')
+    parser.add_argument('width', type=int, help='map width in tiles')
+    parser.add_argument('height', type=int, help='map height in tiles')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--strip-height', type=int, default=4,
+                        help='rows of tiles composited at once')
+    parser.add_argument('--weights', type=parse_weights, default=None,
+                        help='relative terrain weights, such as grass=4,water=0.5')
+    args = parser.parse_args()
+    exporter = Exporter(args.path, terrain_weights=args.weights)
+    stats = exporter.export(args.output, args.width, args.height,
+                            args.seed, args.strip_height)
+    print('Wrote {width}x{height} pixels in {seconds:.2f}s '
+          '({megapixels_per_second:.2f} megapixels/s)'.format(**stats))
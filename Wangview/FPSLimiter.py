@@ -5,19 +5,45 @@ from time import perf_counter, sleep
 class FPSLimiter:
     """
     Allows framerates to be throttled and measured.
+
+    By default each frame sleeps for the remainder of one interval
+    after the previous frame.
+    In precise mode, frames are instead scheduled against absolute deadlines,
+    one interval apart, so that errors in sleeping don't accumulate.
     """
-    def __init__(self, max_fps = 60):
+    def __init__(self, max_fps = 60, precise = False,
+                 spin_threshold = 0.002, max_lag_frames = 2):
         self._frame_count = 0
         self._fps = 0
         self.set_max_fps(max_fps)
+        # Precise mode sleeps until spin_threshold seconds before a deadline,
+        # then spins until the deadline, since sleep() often oversleeps.
+        # Late frames run immediately so that the schedule catches up,
+        # unless they are more than max_lag_frames intervals late,
+        # in which case the missed frames are dropped from the schedule.
+        self.precise = precise
+        self.spin_threshold = spin_threshold
+        self.max_lag_frames = max_lag_frames
         self._previous_time = perf_counter()
         self._start_of_second = self._previous_time
+        self._deadline = None
+        self.reset_stats()
     def set_max_fps(self, max_fps):
         """
         Changes the FPSLimiter's maximum framerate to max_fps.
         """
         self._max_fps = max_fps
         self._interval = 1./max_fps
+        self._deadline = None
+    def reset_stats(self):
+        """
+        Resets the frame time statistics and deadline counters.
+        """
+        self._frames_timed = 0
+        self._mean_frame_time = 0.
+        self._frame_time_m2 = 0.
+        self._missed_deadlines = 0
+        self._dropped_frames = 0
     def wait(self):
         """
         When called every frame, prevents the maximum framerate from being
@@ -29,14 +55,69 @@ class FPSLimiter:
             self._fps = self._frame_count
             self._frame_count = 0
             self._start_of_second = t
-        dt = t - self._previous_time
-        if(dt < self._interval):
-            sleep_interval = self._interval - dt
-            correct_sleep_interval  = min(self._interval, sleep_interval)
-            sleep(correct_sleep_interval)
-        self._previous_time = perf_counter()
+        if self.precise:
+            self._wait_for_deadline(t)
+        else:
+            dt = t - self._previous_time
+            if(dt < self._interval):
+                sleep_interval = self._interval - dt
+                correct_sleep_interval  = min(self._interval, sleep_interval)
+                sleep(correct_sleep_interval)
+        t = perf_counter()
+        self._record_frame_time(t - self._previous_time)
+        self._previous_time = t
+    def _wait_for_deadline(self, t):
+        """
+        Sleeps and then spins until the current deadline,
+        and schedules the next one.
+        """
+        if self._deadline is None:
+            self._deadline = self._previous_time + self._interval
+        lag = t - self._deadline
+        if lag > 0:
+            self._missed_deadlines += 1
+            if lag > self.max_lag_frames*self._interval:
+                # Too far behind to catch up: drop the missed frames
+                self._dropped_frames += int(lag/self._interval)
+                self._deadline = t
+        else:
+            remaining = -lag
+            if remaining > self.spin_threshold:
+                sleep(remaining - self.spin_threshold)
+            while perf_counter() < self._deadline:
+                # Yield to other threads without giving up the rest of the interval
+                sleep(0)
+        self._deadline += self._interval
+    def _record_frame_time(self, dt):
+        """
+        Updates the running mean and variance of frame times (Welford's algorithm).
+        """
+        self._frames_timed += 1
+        delta = dt - self._mean_frame_time
+        self._mean_frame_time += delta/self._frames_timed
+        self._frame_time_m2 += delta*(dt - self._mean_frame_time)
+    def get_max_fps(self):
+        """
+        Returns the maximum framerate.
+        """
+        return self._max_fps
     def get_fps(self):
         """
         Returns the number of times wait() was called in the last completed second.
         """
         return self._fps
+    def get_frame_time_stats(self):
+        """
+        Returns a dict of the mean, variance and standard deviation of frame times
+        in seconds, and the numbers of frames timed, missed deadlines
+        and dropped frames, since the statistics were last reset.
+        Deadlines are only kept in precise mode.
+        """
+        n = self._frames_timed
+        variance = self._frame_time_m2/(n-1) if n > 1 else 0.
+        return {'frames': n,
+                'mean': self._mean_frame_time,
+                'variance': variance,
+                'stdev': variance**0.5,
+                'missed_deadlines': self._missed_deadlines,
+                'dropped_frames': self._dropped_frames}
@@ -0,0 +1,122 @@
+
+# coding: utf-8
+
+# In[ ]:
+
+from collections import deque
+from contextlib import contextmanager
+import json
+from time import perf_counter
+
+
+# In[ ]:
+
+class FrameProfiler(object):
+    """
+    Times the stages of each frame, and keeps the last `window` frames,
+    or every frame if `window` is None,
+    so that rolling statistics can be reported.
+    Stage times are exclusive: time spent in a nested stage
+    is not counted towards the stage containing it.
+    Time spent outside every stage is reported as 'other'.
+    """
+    stages = ('wait', 'clear', 'draw', 'refresh', 'input', 'regenerate')
+    def __init__(self, window=120, log_filename=None):
+        self.window = window
+        self.frame_count = 0
+        self.history = {name: deque(maxlen=window)
+                        for name in self.stages + ('other', 'frame')}
+        # Open a JSON-lines file with one record per frame
+        self.log_file = None if log_filename is None else open(log_filename, 'w')
+        self._times = None
+        self._stack = []
+        self._frame_start = None
+    def begin_frame(self):
+        """Starts timing a new frame"""
+        self._times = dict.fromkeys(self.stages, 0.)
+        self._frame_start = perf_counter()
+    @contextmanager
+    def stage(self, name):
+        """
+        Context manager which adds the time spent inside it to stage `name`.
+        Does nothing outside a frame.
+        """
+        if self._times is None:
+            yield
+            return
+        t = perf_counter()
+        if self._stack:
+            # Pause the enclosing stage
+            parent = self._stack[-1]
+            self._times[parent[0]] += t - parent[1]
+        entry = [name, t]
+        self._stack.append(entry)
+        try:
+            yield
+        finally:
+            t = perf_counter()
+            self._times[name] += t - entry[1]
+            self._stack.pop()
+            if self._stack:
+                self._stack[-1][1] = t
+    def end_frame(self):
+        """
+        Finishes timing the current frame, adds it to the history,
+        and writes it to the log file if there is one.
+        """
+        if self._times is None:
+            return
+        times = self._times
+        times['frame'] = perf_counter() - self._frame_start
+        times['other'] = max(0., times['frame'] - sum(times[name] for name in self.stages))
+        for name, value in times.items():
+            self.history[name].append(value)
+        if self.log_file is not None:
+            record = {'frame': self.frame_count}
+            record.update((name, round(value, 7)) for name, value in times.items()
+                          if name != 'frame')
+            record['total'] = round(times['frame'], 7)
+            self.log_file.write(json.dumps(record) + '\n')
+        self.frame_count += 1
+        self._times = None
+    @staticmethod
+    def percentile(ordered, p):
+        """Returns the `p`th percentile of a sorted non-empty list, by nearest rank"""
+        return ordered[min(len(ordered)-1, int(p/100.*len(ordered)))]
+    @classmethod
+    def summarize(cls, times):
+        """Returns a dict of the mean, p50, p95, p99 and max of a non-empty list of times"""
+        ordered = sorted(times)
+        return {'mean': sum(ordered)/len(ordered),
+                'p50': cls.percentile(ordered, 50),
+                'p95': cls.percentile(ordered, 95),
+                'p99': cls.percentile(ordered, 99),
+                'max': ordered[-1]}
+    def stats(self):
+        """
+        Returns a dict mapping each stage name, 'other' and 'frame'
+        to a dict of the mean, p50, p95, p99 and max time in seconds
+        over the frames in the current window (see `summarize`).
+        Returns an empty dict if no frames have been completed.
+        """
+        return {name: self.summarize(times)
+                for name, times in self.history.items() if times}
+    def summary_lines(self):
+        """
+        Returns the p50, p95 and p99 times of each stage as short lines of text,
+        in milliseconds.
+        """
+        stats = self.stats()
+        if not stats:
+            return []
+        lines = ['{0:<11}{1:>6}{2:>6}{3:>6}'.format('ms', 'p50', 'p95', 'p99')]
+        for name in self.stages + ('other', 'frame'):
+            s = stats[name]
+            lines.append('{0:<11}{1:>6.1f}{2:>6.1f}{3:>6.1f}'.format(
+                name, s['p50']*1e3, s['p95']*1e3, s['p99']*1e3))
+        return lines
+    def close(self):
+        """Closes the log file, if there is one"""
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
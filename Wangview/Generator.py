@@ -0,0 +1,153 @@
+
+# coding: utf-8
+
+# In[ ]:
+
+import sys
+import numpy as np
+from .Display import Display
+from .ArrayEngine import ArrayEngine
+from .Hypergraph import parse_weights
+from .MapFile import MapFile
+
+
+# In[ ]:
+
+class Generator(Display):
+    """
+    Generates terrain and tile maps without a terminal,
+    reusing Display's metadata parsing,
+    and writes them row by row in text or binary formats.
+    """
+    formats = ('text', 'npy', 'raw')
+    layers = ('terrain', 'tiles')
+    def __init__(self,
+                 rel_path='.',
+                 fn_tile_groups='tile_groups.json',
+                 fn_terrain_hypergraph='terrain_hypergraph.json',
+                 fn_tileset_data='tilesets.json',
+                 terrain_weights=None):
+        self.init_metadata(rel_path, fn_tile_groups,
+                           fn_terrain_hypergraph, fn_tileset_data,
+                           terrain_weights=terrain_weights)
+        self.engine = ArrayEngine(self.hypergraph)
+    @classmethod
+    def from_compiled(cls, hypergraph, tile_index):
+        """
+        Returns a Generator using an already compiled Hypergraph and TileIndex,
+        without reading any metadata files.
+        """
+        generator = cls.__new__(cls)
+        generator.hypergraph = hypergraph
+        generator.tile_index = tile_index
+        generator.engine = ArrayEngine(hypergraph)
+        return generator
+    def open_terminal(self):
+        """No terminal is needed for generating"""
+        pass
+    def load_tileset(self, offset, filename):
+        """Tileset images aren't needed for generating"""
+        pass
+    def iter_rows(self, width, height, seed=None):
+        """
+        Yields pairs of (terrain row, tile row) as int32 arrays,
+        for a map of `width` by `height` tiles generated from `seed`.
+        Terrain rows are terrain codes, one wider than tile rows,
+        and there is one more terrain row than there are tile rows,
+        so the final pair's tile row is None.
+        """
+        # Separate generators keep the terrain independent of tile selection
+        terrain_rng, tile_rng = map(np.random.default_rng,
+                                    np.random.SeedSequence(seed).spawn(2))
+        previous_row = None
+        for row in self.engine.iter_rows(width+1, height+1, terrain_rng):
+            if previous_row is not None:
+                tiles = self.tile_index.select(np.array([previous_row, row]), tile_rng)[0]
+                yield previous_row.astype(np.int32), tiles
+            previous_row = row
+        yield previous_row.astype(np.int32), None
+    def iter_layer(self, layer, width, height, seed=None):
+        """Yields the rows of one layer ('terrain' or 'tiles') of a new map"""
+        for terrain, tiles in self.iter_rows(width, height, seed):
+            row = terrain if layer == 'terrain' else tiles
+            if row is not None:
+                yield row
+    def format_text(self, layer, row):
+        """Returns a row as a line of terrain names or tile codepoints, separated by spaces"""
+        if layer == 'terrain':
+            return ' '.join(self.hypergraph.decode_line(row.tolist()))
+        return ' '.join(map(str, row.tolist()))
+    def write(self, f, layer, width, height, seed=None, fmt='text'):
+        """
+        Writes one layer of a new `width` by `height` map to the file `f`, row by row.
+        'text' writes one line per row (see `format_text`),
+        'npy' writes a numpy .npy file of int32 values,
+        and 'raw' writes the same values with no header, in little-endian byte order.
+        Terrain values are indices into self.hypergraph.terrains.
+        Text is written to `f` directly, so binary formats need a binary file.
+        """
+        if fmt not in self.formats:
+            raise ValueError('Unknown format: {0}'.format(fmt))
+        shape = (height+1, width+1) if layer == 'terrain' else (height, width)
+        if fmt == 'npy':
+            # The header only depends on the shape, so rows can follow it one at a time
+            np.lib.format.write_array_header_1_0(
+                f, {'descr': '<i4', 'fortran_order': False, 'shape': shape})
+        for row in self.iter_layer(layer, width, height, seed):
+            if fmt == 'text':
+                f.write(self.format_text(layer, row) + '\n')
+            else:
+                f.write(row.astype('<i4').tobytes())
+    def write_map(self, filename, width, height, seed=None):
+        """
+        Writes both layers of a new `width` by `height` map to a MapFile, row by row,
+        and returns the MapFile.
+        """
+        map_file = MapFile.create(filename, width, height, self.hypergraph.terrains,
+                                  seed, self.codepoint_base)
+        for y, (terrain, tiles) in enumerate(self.iter_rows(width, height, seed)):
+            map_file.terrain[y] = terrain
+            if tiles is not None:
+                map_file.tiles[y] = tiles
+        map_file.flush()
+        return map_file
+
+
+# In[ ]:
+
+def main(argv=None):
+    """Runs the `generate` command, with arguments from `argv` or the command line"""
+    import argparse
+    parser = argparse.ArgumentParser(
+        prog='Wangview.py generate',
+        description='Generate a random Wangscape map without opening a window')
+    parser.add_argument('path', help='Wangscape output directory')
+    parser.add_argument('width', type=int, help='map width in tiles')
+    parser.add_argument('height', type=int, help='map height in tiles')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--layer', choices=Generator.layers, default='terrain',
+                        help='terrain values (one more row and column than tiles) or tile codepoints')
+    parser.add_argument('--format', choices=Generator.formats + ('map',), default='text',
+                        help='text rows, a .npy file, a raw little-endian int32 grid, '
+                             'or a map file of both layers which Wangview can open')
+    parser.add_argument('--output', '-o', default='-', help='file to write (default: stdout)')
+    parser.add_argument('--weights', type=parse_weights, default=None,
+                        help='relative terrain weights, such as grass=4,water=0.5')
+    args = parser.parse_args(argv)
+    generator = Generator(args.path, terrain_weights=args.weights)
+    binary = args.format != 'text'
+    if args.format == 'map':
+        if args.output == '-':
+            parser.error('map files must be written with --output')
+        generator.write_map(args.output, args.width, args.height, args.seed)
+    elif args.output == '-':
+        f = sys.stdout.buffer if binary else sys.stdout
+        generator.write(f, args.layer, args.width, args.height, args.seed, args.format)
+        f.flush()
+    else:
+        with open(args.output, 'wb' if binary else 'w') as f:
+            generator.write(f, args.layer, args.width, args.height, args.seed, args.format)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,22 @@
 
 from functools import reduce
 import random
+from .AliasTable import AliasTable
+
+
+# In[ ]:
+
+class LazyTable(dict):
+    """
+    A dict which computes the value of a missing key with `function`
+    when it is first looked up, and keeps it.
+    """
+    def __init__(self, function, items=()):
+        super(LazyTable, self).__init__(items)
+        self.function = function
+    def __missing__(self, key):
+        value = self[key] = self.function(key)
+        return value
 
 
 # In[ ]:
@@ -14,11 +30,359 @@ class Hypergraph(object):
     Stores data specifying which terrains can be present in a single tile,
     and uses that data to generate random terrain grids.
     """
-    def __init__(self, raw_hypergraph):
+    def __init__(self, raw_hypergraph, compiled=True, weights=None):
         # Input data is a dict of lists of lists.
         # Convert it to a dict of frozensets of frozensets.
         self.data = {k: frozenset(map(frozenset,v))
                      for (k,v) in raw_hypergraph.items()}
+        # Optional dict of relative terrain frequencies; see `compile_weights`
+        self.weights = weights
+        # The compiled lookup tables are created here, filled in as they are used,
+        # and reused by every call to `generate_line`.
+        self.option_table = None
+        self.weighted_table = None
+        if compiled:
+            self.compile()
+    def compile(self, option_masks=None):
+        """
+        Interns terrains as small integers and cliques as bitmasks,
+        and creates self.option_table, a LazyTable of the options
+        of each neighbourhood that `generate_line` encounters, by `neighbourhood_index`.
+        There are (T+1)**4 neighbourhoods of T terrains, but few of them occur,
+        so each one's options are only computed when it is first looked up.
+        Stores the results in self.terrains, self.terrain_codes,
+        self.clique_masks, and self.option_table,
+        and compiles self.weights with `compile_weights`.
+        If `option_masks` is given, it is used as the output of `option_masks`
+        from an earlier compilation, so those options aren't computed again.
+        See also: `neighbourhood_options`
+        """
+        self.terrains = sorted(self.data.keys())
+        self.terrain_codes = {t: i for (i, t) in enumerate(self.terrains)}
+        # The code one past the last terrain marks a missing neighbour
+        self.missing = len(self.terrains)
+        self.all_mask = (1 << len(self.terrains)) - 1
+        cliques = self.flatten_options(self.data.values())
+        self.clique_masks = sorted(self.encode_mask(clique) for clique in cliques)
+        self._mask_cache = {}
+        self._options_cache = {}
+        self.option_table = LazyTable(
+            self.neighbourhood_options,
+            ((index, self.mask_options(mask))
+             for (index, mask) in (option_masks or {}).items()))
+        self.compile_weights()
+    def compile_weights(self):
+        """
+        Prepares alias tables for the options in self.option_table,
+        weighted by self.weights, a dict of terrains to non-negative weights
+        in which missing terrains have weight 1.
+        self.weighted_table is a LazyTable with the same keys as self.option_table,
+        of tuples (options, thresholds, alternatives),
+        where alternatives[i] is the terrain code aliased by options[i];
+        see `weighted_options`.
+        Without weights, self.weighted_table is None and options are equally likely.
+        Raises ValueError if a weight is for an unknown terrain, or negative.
+        See also: `AliasTable`
+        """
+        if self.weights is None:
+            self.weighted_table = None
+            return
+        unknown = set(self.weights) - set(self.terrains)
+        if unknown:
+            raise ValueError('Weights for unknown terrains: {0}'.format(sorted(unknown)))
+        self.terrain_weights = [self.weights.get(t, 1) for t in self.terrains]
+        if any(w < 0 for w in self.terrain_weights):
+            raise ValueError('Terrain weights must be non-negative')
+        # Identical options share one alias table
+        self._alias_cache = {}
+        self.weighted_table = LazyTable(self.weighted_options)
+    def weighted_options(self, index):
+        """
+        Returns the entry of self.weighted_table for the neighbourhood at `index`:
+        its options, and the thresholds and alternatives of their alias table.
+        """
+        options = self.option_table[index]
+        table = self._alias_cache.get(options)
+        if table is None:
+            if not options:
+                table = (options, (), ())
+            else:
+                alias = AliasTable([self.terrain_weights[t] for t in options])
+                table = (options, tuple(alias.thresholds),
+                         tuple(options[a] for a in alias.aliases))
+            self._alias_cache[options] = table
+        return table
+    def set_weights(self, weights):
+        """Replaces self.weights, and recompiles the alias tables if already compiled"""
+        self.weights = weights
+        if self.option_table is not None:
+            self.compile_weights()
+    def option_masks(self):
+        """
+        Returns the options computed so far in self.option_table
+        as a dict of neighbourhood indices to bitmasks,
+        which can be passed to `compile` so they aren't computed again.
+        """
+        masks = {options: sum(1 << t for t in options)
+                 for options in set(self.option_table.values())}
+        return {index: masks[options] for (index, options) in self.option_table.items()}
+    def encode_mask(self, terrains):
+        """Returns a bitmask with one bit set for each terrain in `terrains`"""
+        return sum(1 << self.terrain_codes[t] for t in terrains)
+    def decode_mask(self, mask):
+        """Returns a tuple of the terrain codes whose bits are set in `mask`"""
+        return tuple(i for i in range(self.missing) if mask >> i & 1)
+    def mask_options(self, mask):
+        """
+        Memoized equivalent of `decode_mask`.
+        Identical masks share one options tuple.
+        """
+        options = self._options_cache.get(mask)
+        if options is None:
+            options = self._options_cache[mask] = self.decode_mask(mask)
+        return options
+    def options_mask(self, *codes):
+        """
+        Compiled equivalent of `terrain_options`.
+        Returns a bitmask of the terrains which can legally be placed
+        in the same tile as the terrains coded in `codes`.
+        """
+        mask = self._mask_cache.get(codes)
+        if mask is None:
+            required = 0
+            for c in codes:
+                required |= 1 << c
+            if required == 0:
+                # All terrains are valid
+                mask = self.all_mask
+            else:
+                # Take the union of the cliques containing every required terrain
+                mask = 0
+                for clique in self.clique_masks:
+                    if clique & required == required:
+                        mask |= clique
+            self._mask_cache[codes] = mask
+        return mask
+    def neighbourhood_mask(self, left, up_left, up, up_right):
+        """
+        Compiled equivalent of `terrain_options_2`.
+        Returns a bitmask of the terrains which can legally be placed
+        in a location with the coded terrains `left` (L),
+        and `up_left`, `up`, `up_right` (U, V, W).
+        Any of the codes may be self.missing.
+        """
+        m = self.missing
+        t_left = () if left == m else (left,)
+        if up == m:
+            # Case 1, 2, or 3: only L constrains the output
+            return self.options_mask(*t_left)
+        if up_left == m and up_right == m:
+            # The previous line had a single terrain
+            return self.options_mask(up, *t_left)
+        mask = self.all_mask
+        if up_left != m:
+            # Constraint L, UV or UVL from the tile to the upper left
+            mask &= self.options_mask(up_left, up, *t_left)
+        if up_right != m:
+            # Constraint VW from the tile to the upper right
+            mask &= self.options_mask(up, up_right)
+        return mask
+    def propagate(self, domains, tiles, cell_tiles, queue, trail, stats=None):
+        """
+        Restricts the bitmask domains in `domains` until every tile in `tiles`
+        is consistent, starting from the tile indices in `queue`.
+        A value stays in a cell's domain only if some clique contains it
+        and also intersects the domains of the other corners of each tile.
+        Every changed domain's previous value is appended to `trail`.
+        If `stats` is given, its 'propagations' count is increased
+        by the number of tiles examined.
+        Returns False if a domain becomes empty.
+        """
+        pending = set(queue)
+        cliques = self.clique_masks
+        examined = 0
+        while queue:
+            examined += 1
+            tile = queue.pop()
+            pending.discard(tile)
+            corners = tiles[tile]
+            corner_domains = [domains[c] for c in corners]
+            support = 0
+            for clique in cliques:
+                for d in corner_domains:
+                    if not d & clique:
+                        break
+                else:
+                    support |= clique
+            for c, d in zip(corners, corner_domains):
+                if d & support != d:
+                    if not d & support:
+                        if stats is not None:
+                            stats['propagations'] = stats.get('propagations', 0) + examined
+                        return False
+                    trail.append((c, d))
+                    domains[c] = d & support
+                    for t in cell_tiles[c]:
+                        if t not in pending:
+                            pending.add(t)
+                            queue.append(t)
+        if stats is not None:
+            stats['propagations'] = stats.get('propagations', 0) + examined
+        return True
+    @staticmethod
+    def undo(domains, trail, mark):
+        """Restores the domains changed since `trail` had length `mark`"""
+        while len(trail) > mark:
+            c, d = trail.pop()
+            domains[c] = d
+    def fill_region(self, grid, rng=random, max_backtracks=10000, stats=None):
+        """
+        Assigns a terrain code to every None cell in `grid`,
+        a list of lines of terrain codes,
+        so that every tile agrees with the cells already assigned,
+        including cells after it in the grid.
+        In a grid one cell wide or high, adjacent cells are treated as tiles.
+
+        Each cell has a bitmask domain of its remaining options,
+        which is narrowed by `propagate` after every assignment.
+        Cells are assigned in row-major order,
+        backtracking whenever propagation empties a domain.
+        If `stats` is given, its 'propagations', 'assignments'
+        and 'backtracks' counts are increased.
+        Returns the number of backtracks.
+        Raises IndexError if the region cannot be filled.
+        """
+        height = len(grid)
+        width = len(grid[0])
+        domains = [self.all_mask if t is None else 1 << t
+                   for line in grid for t in line]
+        tiles = [tuple(cy*width+cx
+                       for cy in range(ty, min(ty+2, height))
+                       for cx in range(tx, min(tx+2, width)))
+                 for ty in range(max(1, height-1))
+                 for tx in range(max(1, width-1))]
+        cell_tiles = [[] for d in domains]
+        for i, corners in enumerate(tiles):
+            for c in corners:
+                cell_tiles[c].append(i)
+        free = [i for (i, t) in enumerate(t for line in grid for t in line)
+                if t is None]
+        trail = []
+        if not self.propagate(domains, tiles, cell_tiles, list(range(len(tiles))),
+                              trail, stats):
+            raise IndexError('Cannot fill region with the given boundary')
+        # The remaining options and trail length for each assigned cell
+        stack = []
+        backtracks = 0
+        assignments = 0
+        i = 0
+        while i < len(free):
+            cell = free[i]
+            if len(stack) == i:
+                options = list(self.mask_options(domains[cell]))
+                rng.shuffle(options)
+                stack.append((options, len(trail)))
+            options, mark = stack[i]
+            placed = False
+            while options and not placed:
+                # Undo the previous attempt, then try the next option
+                self.undo(domains, trail, mark)
+                trail.append((cell, domains[cell]))
+                domains[cell] = 1 << options.pop()
+                assignments += 1
+                placed = self.propagate(domains, tiles, cell_tiles,
+                                        list(cell_tiles[cell]), trail, stats)
+            if placed:
+                i += 1
+            else:
+                self.undo(domains, trail, mark)
+                stack.pop()
+                if i == 0 or backtracks == max_backtracks:
+                    self.count_fill(stats, assignments, backtracks)
+                    raise IndexError('Cannot fill region with the given boundary')
+                backtracks += 1
+                i -= 1
+        for i in free:
+            grid[i//width][i%width] = domains[i].bit_length()-1
+        self.count_fill(stats, assignments, backtracks)
+        return backtracks
+    @staticmethod
+    def count_fill(stats, assignments, backtracks):
+        """Adds the counts from one call of `fill_region` to `stats`, if it is given"""
+        if stats is not None:
+            stats['assignments'] = stats.get('assignments', 0) + assignments
+            stats['backtracks'] = stats.get('backtracks', 0) + backtracks
+    def generate_grid_codes(self, width, height, rng=random, fixed=None,
+                            window=4, max_backtracks=1000, stats=None):
+        """
+        Returns `height` lines of `width` terrain codes satisfying adjacency constraints,
+        in which every cell that is not None in the optional list of lines `fixed`
+        has that value.
+
+        Cells are filled by `fill_region` a window of lines at a time,
+        so every cell keeps a bitmask domain,
+        and choices which would leave another cell without options
+        are undone within the window instead of failing.
+        Each window is constrained by the line above it
+        and by the fixed cells of the window after it.
+        If a window can't be filled, the windows before it are refilled with it,
+        doubling the number of lines refilled each time,
+        so a dead end only reaches back as far as it needs to.
+        If `stats` is given, the counts from `fill_region` are added to it,
+        along with 'windows' and 'refills'.
+        Raises IndexError if the fixed cells can't all be satisfied.
+        """
+        if fixed is None:
+            fixed = [[None]*width for y in range(height)]
+        lines = []
+        y = 0
+        span = window
+        while y < height:
+            # Refill `span` lines ending at the end of this window
+            start = max(0, y+window-span)
+            end = min(height, y+window)
+            lookahead = min(height, end+window)
+            grid = ([list(lines[start-1])] if start > 0 else []) + \
+                   [list(line) for line in fixed[start:lookahead]]
+            # Refilling from the first line is an exhaustive search,
+            # so if it fails, the fixed cells can't be satisfied
+            limit = max_backtracks if start > 0 else float('inf')
+            if stats is not None:
+                stats['windows'] = stats.get('windows', 0) + 1
+            try:
+                self.fill_region(grid, rng, limit, stats)
+            except IndexError:
+                if start == 0:
+                    raise
+                if stats is not None:
+                    stats['refills'] = stats.get('refills', 0) + 1
+                span *= 2
+                continue
+            del lines[start:]
+            lines.extend(grid[1 if start > 0 else 0:][:end-start])
+            y = end
+            span = window
+        return lines
+    def neighbourhood_index(self, left, up_left, up, up_right):
+        """Returns the key of a neighbourhood in self.option_table"""
+        n = self.missing+1
+        return ((left*n + up_left)*n + up)*n + up_right
+    def neighbourhood_options(self, index):
+        """
+        Returns the options of the neighbourhood whose key in self.option_table is `index`,
+        as a tuple of terrain codes. Computes missing entries of self.option_table.
+        """
+        n = self.missing+1
+        index, up_right = divmod(index, n)
+        index, up = divmod(index, n)
+        left, up_left = divmod(index, n)
+        return self.mask_options(self.neighbourhood_mask(left, up_left, up, up_right))
+    def encode_line(self, line):
+        """Converts a sequence of terrains into a list of terrain codes"""
+        return [self.terrain_codes[t] for t in line]
+    def decode_line(self, codes):
+        """Converts a sequence of terrain codes into a list of terrains"""
+        return [self.terrains[c] for c in codes]
     @staticmethod
     def flatten_options(options):
         """Returns the union of the all the sets contained in `options`"""
@@ -92,6 +456,10 @@ class Hypergraph(object):
         If previous_line is a sequence of terrains,
         Each output terrain will also agree with the adjacent terrains in that line.
         """
+        if self.option_table is not None:
+            if previous_line is not None:
+                previous_line = self.encode_line(previous_line)
+            return self.decode_line(self.generate_line_codes(width, previous_line))
         new_line = []
         # L in `terrain_options_2` is not present in the first row
         t_left = []
@@ -110,8 +478,52 @@ class Hypergraph(object):
             # Set L to the value just inserted
             t_left = [new_line[-1]]
         return new_line
+    def generate_line_codes(self, width, previous_line=None, rng=random):
+        """
+        Compiled equivalent of `generate_line`,
+        taking and returning lines of terrain codes.
+        Each position costs one lookup in self.option_table
+        and one random choice from `rng`.
+        If terrains are weighted, each choice is sampled
+        from the matching alias table in self.weighted_table instead,
+        which also costs one random draw.
+        """
+        m = self.missing
+        n = m+1
+        # Pad the previous line so that U, V, W can be read at (i, i+1, i+2)
+        if previous_line is None:
+            up = [m]*(width+2)
+        else:
+            up = [m]
+            up.extend(previous_line)
+            up.extend((m, m))
+        new_line = []
+        left = m
+        if self.weighted_table is None:
+            table = self.option_table
+            choice = rng.choice
+            for i in range(width):
+                left = choice(table[((left*n + up[i])*n + up[i+1])*n + up[i+2]])
+                new_line.append(left)
+            return new_line
+        table = self.weighted_table
+        draw = rng.random
+        for i in range(width):
+            options, thresholds, alternatives = \
+                table[((left*n + up[i])*n + up[i+1])*n + up[i+2]]
+            # Inlined `AliasTable.sample`
+            u = draw()*len(options)
+            j = int(u)
+            left = options[j] if u-j < thresholds[j] else alternatives[j]
+            new_line.append(left)
+        return new_line
     def generate_lines(self, width, height):
         """Yields each line of a grid of terrain values satisfying the ajdacency constraints"""
+        if self.option_table is not None:
+            # Keep lines coded between iterations, and only decode the output
+            for line in self.generate_lines_codes(width, height):
+                yield self.decode_line(line)
+            return
         # Yield a line with no constraints from a preceding line
         line = self.generate_line(width)
         yield line
@@ -119,6 +531,31 @@ class Hypergraph(object):
             # Yield a line with additional constraints from the previous line
             line = self.generate_line(width, line)
             yield line
+    def generate_lines_codes(self, width, height, rng=random):
+        """Compiled equivalent of `generate_lines`, yielding lines of terrain codes"""
+        line = self.generate_line_codes(width, rng=rng)
+        yield line
+        for i in range(height):
+            line = self.generate_line_codes(width, line, rng)
+            yield line
+
+
+# In[ ]:
+
+def parse_weights(text):
+    """
+    Parses relative terrain weights from the command line,
+    written as comma-separated pairs such as 'grass=4,water=0.5',
+    into a dict for `Hypergraph`'s `weights`.
+    Raises ValueError if a pair has no '=' or its weight isn't a number.
+    """
+    weights = {}
+    for pair in text.split(','):
+        terrain, separator, weight = pair.rpartition('=')
+        if not separator:
+            raise ValueError('Expected terrain=weight: {0}'.format(pair))
+        weights[terrain.strip()] = float(weight)
+    return weights
 
 
 # In[ ]:
@@ -0,0 +1,94 @@
+
+# coding: utf-8
+
+# In[ ]:
+
+import json
+import struct
+import numpy as np
+
+
+# In[ ]:
+
+class MapFile(object):
+    """
+    A terrain and tile map stored in a file, which is memory-mapped
+    so that only the parts which are read are loaded.
+
+    The file holds a magic string, the length of a JSON header,
+    the header (the map's size in tiles, the terrain names, the seed,
+    the codepoint base, and the dtypes of the payload),
+    and then the payload: (height+1) rows of width+1 terrain codes,
+    followed by height rows of width tile codepoints, all row-major.
+    """
+    magic = b'WANGMAP1'
+    # The payload starts at a multiple of this many bytes
+    alignment = 64
+    def __init__(self, filename, mode='r'):
+        """
+        Opens an existing map file.
+        Use mode 'r+' to allow the map to be written to.
+        """
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            if f.read(len(self.magic)) != self.magic:
+                raise ValueError('Not a Wangview map file: {0}'.format(filename))
+            length, = struct.unpack('<I', f.read(4))
+            self.header = json.loads(f.read(length).decode('utf-8'))
+        self.width = self.header['width']
+        self.height = self.header['height']
+        self.terrains = self.header['terrains']
+        self.seed = self.header['seed']
+        self.codepoint_base = self.header['codepoint_base']
+        offset = self.header['offset']
+        terrain_dtype = np.dtype(self.header['terrain_dtype'])
+        self.terrain = np.memmap(filename, terrain_dtype, mode, offset,
+                                 (self.height+1, self.width+1))
+        offset += self.terrain.nbytes
+        self.tiles = np.memmap(filename, np.dtype(self.header['tile_dtype']), mode, offset,
+                               (self.height, self.width))
+    @classmethod
+    def create(cls, filename, width, height, terrains, seed=None, codepoint_base=0xE000):
+        """
+        Creates a map file for a map of `width` by `height` tiles,
+        and returns it opened for writing.
+        The payload isn't written, so it may be stored sparsely until it is filled.
+        """
+        terrain_dtype = np.dtype('<u1' if len(terrains) <= 256 else '<u2')
+        tile_dtype = np.dtype('<i4')
+        header = {'width': width,
+                  'height': height,
+                  'terrains': list(terrains),
+                  'seed': seed,
+                  'codepoint_base': codepoint_base,
+                  'terrain_dtype': terrain_dtype.str,
+                  'tile_dtype': tile_dtype.str,
+                  'offset': 0}
+        # The offset's own digits count towards the header's length
+        text = json.dumps(header).encode('utf-8')
+        header['offset'] = -(-(len(cls.magic) + 4 + len(text) + 20)//cls.alignment)*cls.alignment
+        text = json.dumps(header).encode('utf-8')
+        size = (header['offset'] + (height+1)*(width+1)*terrain_dtype.itemsize
+                + height*width*tile_dtype.itemsize)
+        with open(filename, 'wb') as f:
+            f.write(cls.magic)
+            f.write(struct.pack('<I', len(text)))
+            f.write(text)
+            f.truncate(size)
+        return cls(filename, 'r+')
+    def terrain_region(self, x, y, width, height):
+        """
+        Returns a copy of the terrain codes with top left corner (x, y),
+        as an int32 array of shape (height, width).
+        """
+        return np.array(self.terrain[y:y+height, x:x+width], dtype=np.int32)
+    def tile_region(self, x, y, width, height):
+        """
+        Returns a copy of the tile codepoints with top left corner (x, y),
+        as an int32 array of shape (height, width).
+        """
+        return np.array(self.tiles[y:y+height, x:x+width], dtype=np.int32)
+    def flush(self):
+        """Writes any changes to the map to its file"""
+        self.terrain.flush()
+        self.tiles.flush()
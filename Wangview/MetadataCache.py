@@ -0,0 +1,125 @@
+
+# coding: utf-8
+
+# In[ ]:
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import numpy as np
+
+
+# In[ ]:
+
+class MetadataCache(object):
+    """
+    Stores compiled metadata in a single binary file,
+    valid only while the source files it was compiled from are unchanged.
+
+    The file holds a magic string, the length of a JSON header,
+    the header, and then the raw data of several numpy arrays,
+    whose dtypes, shapes and offsets are listed in the header.
+    It is memory-mapped when loaded, so arrays are not copied.
+    """
+    magic = b'WANGVIEW2'
+    # Array data is aligned to this many bytes
+    alignment = 16
+    def __init__(self, sources, filename):
+        self.sources = sources
+        self.filename = filename
+    @staticmethod
+    def file_hash(filename):
+        """Returns the SHA-1 hex digest of a file's contents"""
+        with open(filename, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    def source_keys(self):
+        """Returns a list of dicts of the size, mtime and content hash of each source file"""
+        keys = []
+        for source in self.sources:
+            stat = os.stat(source)
+            keys.append({'size': stat.st_size,
+                         'mtime_ns': stat.st_mtime_ns,
+                         'sha1': self.file_hash(source)})
+        return keys
+    def is_valid(self, keys):
+        """
+        Returns True if the source files match `keys`.
+        Files are only hashed if their size matches but their mtime doesn't.
+        """
+        if len(keys) != len(self.sources):
+            return False
+        for source, key in zip(self.sources, keys):
+            stat = os.stat(source)
+            if stat.st_size != key['size']:
+                return False
+            if (stat.st_mtime_ns != key['mtime_ns'] and
+                    self.file_hash(source) != key['sha1']):
+                return False
+        return True
+    def load(self):
+        """
+        Returns the cached header and a dict of arrays,
+        or None if there is no cache or it doesn't match the source files.
+        """
+        try:
+            with open(self.filename, 'rb') as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        start = len(self.magic) + 4
+        if data[:len(self.magic)] != self.magic:
+            return None
+        try:
+            length, = struct.unpack('<I', data[len(self.magic):start])
+            header = json.loads(data[start:start+length].decode('utf-8'))
+            if not self.is_valid(header['sources']):
+                return None
+            arrays = {name: np.frombuffer(data, dtype=dtype, count=int(np.prod(shape)),
+                                          offset=offset).reshape(shape)
+                      for (name, (dtype, shape, offset)) in header['arrays'].items()}
+        except (OSError, ValueError, KeyError, struct.error):
+            # A damaged cache is treated as missing
+            return None
+        return header['data'], arrays
+    def save(self, data, arrays):
+        """
+        Writes the JSON-serializable `data` and a dict of numpy arrays to the cache,
+        keyed by the current state of the source files.
+        Returns False if the cache file couldn't be written.
+        """
+        layout = {}
+        offsets = {}
+        offset = 0
+        for name, array in arrays.items():
+            offset = -(-offset//self.alignment)*self.alignment
+            offsets[name] = offset
+            layout[name] = [array.dtype.str, list(array.shape), offset]
+            offset += array.nbytes
+        header = {'sources': self.source_keys(), 'data': data, 'arrays': layout}
+        # Array offsets are absolute, so the arrays start after the encoded header,
+        # whose length depends on the offsets
+        base = len(self.magic) + 4 + len(json.dumps(header))
+        while True:
+            base = -(-base//self.alignment)*self.alignment
+            for name, entry in layout.items():
+                entry[2] = offsets[name] + base
+            text = json.dumps(header).encode('utf-8')
+            if len(self.magic) + 4 + len(text) <= base:
+                break
+            base += 1
+        text += b' '*(base - len(self.magic) - 4 - len(text))
+        temporary = self.filename + '.tmp'
+        try:
+            with open(temporary, 'wb') as f:
+                f.write(self.magic)
+                f.write(struct.pack('<I', len(text)))
+                f.write(text)
+                for name, array in arrays.items():
+                    f.seek(layout[name][2])
+                    f.write(np.ascontiguousarray(array).tobytes())
+            os.replace(temporary, self.filename)
+        except OSError:
+            return False
+        return True
@@ -0,0 +1,49 @@
+
+# coding: utf-8
+
+# In[ ]:
+
+import struct
+import zlib
+import numpy as np
+
+
+# In[ ]:
+
+class PNGWriter(object):
+    """
+    Writes an 8-bit RGBA PNG image to a binary file object,
+    compressing blocks of rows as they arrive,
+    so the whole image never needs to be held in memory.
+    """
+    signature = b'\x89PNG\r\n\x1a\n'
+    def __init__(self, f, width, height, compression=6):
+        self.f = f
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self._compressor = zlib.compressobj(compression)
+        f.write(self.signature)
+        # 8 bits per channel, colour type 6 (RGBA), no interlacing
+        self.write_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+    def write_chunk(self, kind, data):
+        """Writes one PNG chunk of type `kind` containing `data`"""
+        self.f.write(struct.pack('>I', len(data)))
+        self.f.write(kind)
+        self.f.write(data)
+        self.f.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(kind)) & 0xFFFFFFFF))
+    def write_rows(self, pixels):
+        """Appends `pixels`, a uint8 array of shape (rows, width, 4), to the image"""
+        rows = np.zeros((len(pixels), self.width*4+1), dtype=np.uint8)
+        # The first byte of each row selects filter type 0 (none)
+        rows[:,1:] = pixels.reshape(len(pixels), self.width*4)
+        data = self._compressor.compress(rows.tobytes())
+        if data:
+            self.write_chunk(b'IDAT', data)
+        self.rows_written += len(pixels)
+    def close(self):
+        """Finishes the image. Every row must have been written."""
+        if self.rows_written != self.height:
+            raise ValueError('{0} of {1} rows written'.format(self.rows_written, self.height))
+        self.write_chunk(b'IDAT', self._compressor.flush())
+        self.write_chunk(b'IEND', b'')
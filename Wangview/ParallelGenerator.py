@@ -0,0 +1,110 @@
+# coding: utf-8
+
+# In[ ]:
+
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import numpy as np
+from .ArrayEngine import ArrayEngine
+
+
+# In[ ]:
+
+# State of a worker process, set once by `init_worker`
+_worker = {}
+
+def init_worker(hypergraph):
+    """Creates the ArrayEngine used to generate bands in a worker process"""
+    _worker['engine'] = ArrayEngine(hypergraph)
+
+def generate_band(height, upper_seam, lower_seam, seed):
+    """
+    Returns a (height, width) int32 array of terrain codes,
+    whose first row is `upper_seam`, and whose last row agrees with `lower_seam`,
+    the first row of the next band, unless it is None.
+    Rows are generated from `seed`, a SeedSequence, by the row generator,
+    each constrained by the row above.
+    With a lower seam, only the top half of the band is generated freely;
+    see `join_band` for the rest.
+    """
+    engine = _worker['engine']
+    rng = np.random.default_rng(seed)
+    width = len(upper_seam)
+    band = np.empty((height, width), dtype=np.int32)
+    band[0] = upper_seam
+    free = height-1 if lower_seam is None else (height-2)//2
+    for y, row in enumerate(engine.iter_rows(width, free, rng, upper_seam), 1):
+        band[y] = row
+    if lower_seam is not None:
+        join_band(band, free+1, lower_seam, rng)
+    return band
+
+def join_band(band, start, lower_seam, rng):
+    """
+    Fills the rows of `band` from `start` onwards, so that they lead to `lower_seam`.
+
+    Two arbitrary rows can't generally be joined by a few rows between them,
+    so the rows follow a guide: a sequence of rows known to lead to the seam.
+    The guide is the rows above `start` in reverse, back to the upper seam,
+    repeated as needed, and then the lower seam,
+    which was generated as the row after the upper seam.
+    Each row is generated to agree with the row above it and the next row of the guide,
+    so if that fails, the guide's own row always fits instead.
+    """
+    engine = _worker['engine']
+    height, width = band.shape
+    guide = ([band[y] for y in range(start-2, -1, -1)] +
+             [band[0]]*(height-2*start+1) + [lower_seam])
+    for y in range(start, height):
+        try:
+            band[y] = engine.generate_row(width, rng, band[y-1], guide[y-start+1])
+        except IndexError:
+            band[y] = guide[y-start]
+
+
+# In[ ]:
+
+class ParallelGenerator(object):
+    """
+    Generates one large terrain map using several processes.
+
+    The map is split into horizontal bands of `band_height` rows.
+    The first row of each band is a seam, and the seams are generated first,
+    as consecutive rows of the row generator of an `ArrayEngine`.
+    Then each band is filled in by a worker, a row at a time,
+    from its seam down to the seam of the next band; see `generate_band`.
+    The result depends only on the seed and band height,
+    and not on the number of workers.
+    """
+    def __init__(self, hypergraph, band_height=64, workers=None):
+        if band_height < 2:
+            raise ValueError('Bands must be at least two rows high')
+        self.hypergraph = hypergraph
+        self.band_height = band_height
+        self.workers = workers
+    def generate(self, width, height, seed):
+        """
+        Returns a (height, width) int32 array of terrain codes generated from `seed`.
+        With one worker, everything is generated in this process.
+        """
+        starts = list(range(0, height, self.band_height))
+        heights = [min(self.band_height, height-y) for y in starts]
+        seam_seed, *band_seeds = np.random.SeedSequence(seed).spawn(len(starts)+1)
+        seams = list(ArrayEngine(self.hypergraph).iter_rows(
+            width, len(starts), np.random.default_rng(seam_seed)))
+        arguments = (heights, seams, seams[1:] + [None], band_seeds)
+        initargs = (self.hypergraph,)
+        if self.workers == 1:
+            init_worker(*initargs)
+            return self.assemble(map(generate_band, *arguments), width, height)
+        with ProcessPoolExecutor(self.workers, multiprocessing.get_context('spawn'),
+                                 initializer=init_worker, initargs=initargs) as executor:
+            return self.assemble(executor.map(generate_band, *arguments), width, height)
+    def assemble(self, bands, width, height):
+        """Copies the bands, in order, into one (height, width) array"""
+        grid = np.empty((height, width), dtype=np.int32)
+        y = 0
+        for band in bands:
+            grid[y:y+len(band)] = band
+            y += len(band)
+        return grid
@@ -0,0 +1,47 @@
+
+# coding: utf-8
+
+# In[ ]:
+
+from .Terminal import terminal as blt
+
+
+# In[ ]:
+
+class Renderer(object):
+    """
+    Draws tiles to the terminal, either one at a time,
+    or a whole row of tiles with the same pixel offset in a single call.
+    Every terminal call made by `Display.draw` goes through a Renderer,
+    so that a recording Renderer can stand in for the terminal.
+    """
+    def clear(self):
+        """Clears every layer of the terminal"""
+        blt.clear()
+    def clear_area(self, x, y, width, height):
+        """Clears a rectangle of cells in the current layer"""
+        blt.clear_area(x, y, width, height)
+    def layer(self, layer):
+        """Selects the layer to draw on"""
+        blt.layer(layer)
+    def put(self, x, y, dx, dy, codepoint):
+        """Draws one tile in cell (x, y), offset by (dx, dy) pixels"""
+        blt.put_ext(x, y, dx, dy, codepoint)
+    @staticmethod
+    def row_text(dx, dy, codepoints):
+        """
+        Returns the text which `put_row` draws as a row of tiles,
+        each offset by (dx, dy) pixels, using print's offset markup.
+        Codepoint 0 is left blank.
+        The text only depends on its arguments, so it can be cached.
+        """
+        text = ''.join(map(chr, codepoints)).replace('\0', ' ')
+        if dx or dy:
+            return '[offset={0},{1}]{2}'.format(dx, dy, text)
+        return text
+    def put_row(self, x, y, text):
+        """Draws a row of tiles from `row_text`, starting in cell (x, y)"""
+        blt.print_(x, y, text)
+    def text(self, x, y, text):
+        """Prints a line of text, starting in cell (x, y)"""
+        blt.print_(x, y, text)
@@ -0,0 +1,99 @@
+
+# coding: utf-8
+
+# In[ ]:
+
+import numpy as np
+
+
+# In[ ]:
+
+class RingGrid(object):
+    """
+    A fixed-size 2D grid of integers stored in a numpy array,
+    whose rows and columns wrap around a movable origin.
+    Pushing a row or column onto one edge drops the row or column
+    on the opposite edge, like appending to a bounded deque,
+    but only writes the new values instead of moving the others.
+
+    Values are indexed as grid[y, x], relative to the top left corner,
+    and reading a single value returns a Python int.
+    """
+    def __init__(self, width, height, dtype=np.int32, fill=0):
+        self.width = width
+        self.height = height
+        self.data = np.full((height, width), fill, dtype=dtype)
+        # Position in self.data of the top left value
+        self.origin_x = 0
+        self.origin_y = 0
+    @classmethod
+    def from_lines(cls, lines, dtype=np.int32):
+        """Returns a RingGrid containing a sequence of equally long lines of values"""
+        data = np.array(lines, dtype=dtype)
+        grid = cls(data.shape[1], data.shape[0], dtype)
+        grid.data = data
+        return grid
+    def __len__(self):
+        return self.height
+    def __getitem__(self, position):
+        y, x = position
+        return self.data[(y+self.origin_y) % self.height,
+                         (x+self.origin_x) % self.width].item()
+    def __setitem__(self, position, value):
+        y, x = position
+        self.data[(y+self.origin_y) % self.height,
+                  (x+self.origin_x) % self.width] = value
+    def row_index(self, y):
+        """Returns the position in self.data of row `y`"""
+        return (y+self.origin_y) % self.height
+    def column_index(self, x):
+        """Returns the position in self.data of column `x`"""
+        return (x+self.origin_x) % self.width
+    def row(self, y):
+        """Returns a copy of row `y`, from left to right"""
+        return np.roll(self.data[self.row_index(y)], -self.origin_x)
+    def column(self, x):
+        """Returns a copy of column `x`, from top to bottom"""
+        return np.roll(self.data[:, self.column_index(x)], -self.origin_y)
+    def set_row(self, y, values):
+        """Overwrites row `y` with a sequence of values, from left to right"""
+        self.data[self.row_index(y)] = np.roll(np.asarray(values), self.origin_x)
+    def set_column(self, x, values):
+        """Overwrites column `x` with a sequence of values, from top to bottom"""
+        self.data[:, self.column_index(x)] = np.roll(np.asarray(values), self.origin_y)
+    def push_right(self, values):
+        """Drops the left column, and adds a column of values on the right"""
+        self.data[:, self.origin_x] = np.roll(np.asarray(values), self.origin_y)
+        self.origin_x = (self.origin_x+1) % self.width
+    def push_left(self, values):
+        """Drops the right column, and adds a column of values on the left"""
+        self.origin_x = (self.origin_x-1) % self.width
+        self.data[:, self.origin_x] = np.roll(np.asarray(values), self.origin_y)
+    def push_down(self, values):
+        """Drops the top row, and adds a row of values at the bottom"""
+        self.data[self.origin_y] = np.roll(np.asarray(values), self.origin_x)
+        self.origin_y = (self.origin_y+1) % self.height
+    def push_up(self, values):
+        """Drops the bottom row, and adds a row of values at the top"""
+        self.origin_y = (self.origin_y-1) % self.height
+        self.data[self.origin_y] = np.roll(np.asarray(values), self.origin_x)
+    def resize(self, width, height, fill=0):
+        """
+        Changes the size of the grid, keeping the values which still fit
+        relative to the top left corner, and filling new values with `fill`.
+        """
+        data = np.full((height, width), fill, dtype=self.data.dtype)
+        kept_width = min(width, self.width)
+        kept_height = min(height, self.height)
+        data[:kept_height, :kept_width] = self.to_array()[:kept_height, :kept_width]
+        self.data = data
+        self.width = width
+        self.height = height
+        self.origin_x = 0
+        self.origin_y = 0
+    def to_array(self):
+        """Returns a copy of the grid as a numpy array, with the origin at [0, 0]"""
+        return np.roll(self.data, (-self.origin_y, -self.origin_x), axis=(0, 1))
+    def tolist(self):
+        """Returns the grid as a list of lines of Python ints"""
+        return self.to_array().tolist()
@@ -0,0 +1,102 @@
+
+# coding: utf-8
+
+# In[ ]:
+
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import random
+from time import perf_counter
+import numpy as np
+from .ChunkStore import ChunkStore
+
+
+# In[ ]:
+
+# State of the worker process, set once by `init_worker`
+_worker = {}
+
+def init_worker(hypergraph, tile_index, tile_groups, chunk_size):
+    """Stores the metadata needed to generate scenes in the worker process"""
+    _worker['hypergraph'] = hypergraph
+    _worker['tile_index'] = tile_index
+    _worker['world'] = ChunkStore(hypergraph, tile_groups, None, chunk_size)
+
+def generate_scene(width, height, seed, world_origin=None):
+    """
+    Returns the terrain code lines and tile lines of a scene
+    `width` by `height` tiles, generated from `seed`.
+    If `world_origin` is given, the scene is the region of the world
+    generated from `seed` whose top left tile is at `world_origin`,
+    otherwise it is independently random.
+    """
+    hypergraph = _worker['hypergraph']
+    if world_origin is None:
+        rng = random.Random(seed)
+        # generate_lines_codes yields one line more than it is asked for
+        terrain = list(hypergraph.generate_lines_codes(width+1, height+1, rng))[1:]
+        tiles = _worker['tile_index'].select(terrain, np.random.default_rng(seed)).tolist()
+    else:
+        world = _worker['world']
+        world.reseed(seed)
+        terrain = [hypergraph.encode_line(line) for line in
+                   world.terrain_region(world_origin[0], world_origin[1], width+1, height+1)]
+        tiles = world.tile_region(world_origin[0], world_origin[1], width, height)
+    return terrain, tiles
+
+def timed_generate_scene(*args):
+    """Returns the result of `generate_scene` and the seconds it took"""
+    start = perf_counter()
+    scene = generate_scene(*args)
+    return scene, perf_counter() - start
+
+
+# In[ ]:
+
+class SceneWorker(object):
+    """
+    Generates the next scene in a separate process,
+    so that it is ready to be shown as soon as it is wanted.
+    Only one scene is generated at a time.
+    """
+    def __init__(self, hypergraph, tile_index, tile_groups, chunk_size=16):
+        # Spawning avoids copying the parent's terminal into the worker
+        self.executor = ProcessPoolExecutor(
+            1, multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+            initargs=(hypergraph, tile_index, tile_groups, chunk_size))
+        self.future = None
+        self.request = None
+        # Seconds the worker took to generate the last scene taken
+        self.generation_time = None
+    def submit(self, width, height, seed, world_origin=None):
+        """
+        Starts generating a scene; see `generate_scene`.
+        Any scene which has not been taken is discarded.
+        """
+        if self.future is not None:
+            self.future.cancel()
+        self.request = (width, height, seed, world_origin)
+        self.future = self.executor.submit(timed_generate_scene, *self.request)
+    def ready(self):
+        """Returns True if a finished scene is waiting to be taken"""
+        return self.future is not None and self.future.done()
+    def take(self):
+        """
+        Returns the arguments of the finished scene's `submit` call
+        and its terrain and tile lines, without blocking,
+        and sets self.generation_time to the time the worker took to generate it.
+        Returns None if no scene is ready.
+        Raises the worker's exception if generation failed.
+        """
+        if not self.ready():
+            return None
+        future, self.future = self.future, None
+        scene, self.generation_time = future.result()
+        return self.request, scene
+    def close(self):
+        """Stops the worker process, without waiting for a scene in progress"""
+        if self.future is not None:
+            self.future.cancel()
+            self.future = None
+        self.executor.shutdown(wait=False)
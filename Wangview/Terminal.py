@@ -0,0 +1,29 @@
+
+# coding: utf-8
+
+# In[ ]:
+
+import importlib
+
+
+# In[ ]:
+
+class LazyModule(object):
+    """
+    Stands in for a module which is only imported
+    when one of its attributes is first used.
+    """
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+    def __getattr__(self, attribute):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attribute)
+
+
+# In[ ]:
+
+# bearlibterminal loads a native library and needs a display,
+# so it isn't imported until a window is opened
+terminal = LazyModule('bearlibterminal.terminal')
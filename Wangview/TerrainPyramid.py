@@ -0,0 +1,114 @@
+
+# coding: utf-8
+
+# In[ ]:
+
+import numpy as np
+
+
+# In[ ]:
+
+class TerrainPyramid(object):
+    """
+    Stores successively smaller summaries of a terrain grid,
+    for drawing a zoomed out view without reading the whole grid.
+
+    Level 0 is the grid itself, and is not copied,
+    so it may be a memory-mapped array (see `MapFile`).
+    Each cell of level k+1 holds the dominant terrain of a 2x2 block of level k:
+    the most common of the four, or the first in row-major order if there is a tie.
+    A cell of level k therefore summarises a 2**k by 2**k block of the grid.
+    Blocks on the right and bottom edges may be narrower;
+    their missing cells are copied from the cells beside them.
+    Levels are added until the top level is a single cell.
+    """
+    def __init__(self, terrain, strip_height=512):
+        """
+        Builds every level from `terrain`, a 2D array of terrain codes.
+        Level 1 is built from strips of `strip_height` lines of level 0,
+        so that a memory-mapped grid is read sequentially
+        and never loaded into memory all at once.
+        """
+        self.levels = [terrain]
+        level = self.reduce_strips(terrain, strip_height)
+        while True:
+            self.levels.append(level)
+            if level.shape[0] <= 1 and level.shape[1] <= 1:
+                break
+            level = self.reduce(level)
+    @staticmethod
+    def dominant(a, b, c, d):
+        """
+        Returns an array of the most common value at each position
+        of four equally shaped arrays, preferring the earliest array in a tie.
+        """
+        ab, ac, ad = a == b, a == c, a == d
+        bc, bd, cd = b == c, b == d, c == d
+        result = a.copy()
+        best = ab.astype(np.int8) + ac + ad
+        for count, values in ((ab.astype(np.int8) + bc + bd, b),
+                              (ac.astype(np.int8) + bc + cd, c),
+                              (ad.astype(np.int8) + bd + cd, d)):
+            better = count > best
+            result[better] = values[better]
+            np.maximum(best, count, out=best)
+        return result
+    @classmethod
+    def reduce(cls, grid):
+        """Returns the next level up from `grid`, which is half as high and wide, rounding up"""
+        grid = np.asarray(grid)
+        height, width = grid.shape
+        if height % 2 or width % 2:
+            # Edge blocks reuse their last line
+            grid = np.pad(grid, ((0, height % 2), (0, width % 2)), mode='edge')
+        return cls.dominant(grid[0::2, 0::2], grid[0::2, 1::2],
+                            grid[1::2, 0::2], grid[1::2, 1::2])
+    @classmethod
+    def reduce_strips(cls, grid, strip_height):
+        """Equivalent to `reduce`, reading `grid` in strips of about `strip_height` lines"""
+        strip_height += strip_height % 2
+        height, width = grid.shape
+        result = np.empty(((height+1)//2, (width+1)//2), dtype=grid.dtype)
+        for y in range(0, height, strip_height):
+            result[y//2:(y+strip_height)//2] = cls.reduce(grid[y:y+strip_height])
+        return result
+    def __len__(self):
+        return len(self.levels)
+    def shape(self, level):
+        """Returns the (height, width) of a level"""
+        return self.levels[level].shape
+    def level_for(self, width, height):
+        """Returns the lowest level which fits in `width` by `height` cells"""
+        for level, grid in enumerate(self.levels):
+            if grid.shape[0] <= height and grid.shape[1] <= width:
+                return level
+        return len(self.levels)-1
+    def region(self, level, x, y, width, height, fill=-1):
+        """
+        Returns the cells of a level with top left corner (x, y)
+        as an int32 array of shape (height, width),
+        where cells outside the level have the value `fill`.
+        Only the cells inside the region are read.
+        """
+        grid = self.levels[level]
+        result = np.full((height, width), fill, dtype=np.int32)
+        x0, y0 = max(x, 0), max(y, 0)
+        x1 = min(x+width, grid.shape[1])
+        y1 = min(y+height, grid.shape[0])
+        if x0 < x1 and y0 < y1:
+            result[y0-y:y1-y, x0-x:x1-x] = grid[y0:y1, x0:x1]
+        return result
+    def update(self, x, y, width, height):
+        """
+        Recomputes the cells of every level above 0 which summarise
+        the `width` by `height` region of level 0 with top left corner (x, y),
+        after it has been changed.
+        Each level only reads the cells below the changed cells.
+        """
+        x1, y1 = x+width-1, y+height-1
+        for level in range(1, len(self.levels)):
+            below = self.levels[level-1]
+            x, y, x1, y1 = x//2, y//2, x1//2, y1//2
+            # Aligned to whole blocks, so only the edges of the level need padding
+            block = self.reduce(below[2*y:2*y1+2, 2*x:2*x1+2])
+            self.levels[level][y:y1+1, x:x1+1] = block
@@ -0,0 +1,153 @@
+
+# coding: utf-8
+
+# In[ ]:
+
+import random
+import numpy as np
+from .AliasTable import AliasTable
+
+
+# In[ ]:
+
+class TileIndex(object):
+    """
+    Stores tile groups as flat arrays indexed by terrain codes,
+    so that tiles can be selected for a whole grid of terrain codes
+    with vectorized gathers.
+    Tiles may be weighted, in which case each group is compiled
+    into an alias table, stored in the flat arrays self.thresholds and self.aliases.
+    Both tables are read with the same single draw per tile.
+    """
+    def __init__(self, tile_groups, terrain_codes, tile_weights=None):
+        """
+        Compiles `tile_groups`, in the format of `Display.tile_groups`,
+        using the terrain codes in `terrain_codes` (see `Hypergraph.compile`).
+        Groups containing terrains without codes are ignored.
+        If `tile_weights` is given, it has the same keys as `tile_groups`,
+        and lists of the relative weights of their tiles.
+        """
+        shape = (len(terrain_codes),)*4
+        # starts[a,b,c,d] is the position of the first codepoint in group (a,b,c,d),
+        # and counts[a,b,c,d] is the number of codepoints in that group.
+        self.starts = np.zeros(shape, dtype=np.int64)
+        self.counts = np.zeros(shape, dtype=np.int64)
+        codepoints = []
+        weights = []
+        for corners, tiles in sorted(tile_groups.items()):
+            if not all(t in terrain_codes for t in corners):
+                continue
+            key = tuple(terrain_codes[t] for t in corners)
+            self.starts[key] = len(codepoints)
+            self.counts[key] = len(tiles)
+            codepoints.extend(tiles)
+            if tile_weights is not None:
+                weights.extend(tile_weights[corners])
+        self.codepoints = np.array(codepoints, dtype=np.int32)
+        self.weights = None
+        self.thresholds = None
+        self.aliases = None
+        self.choices = None
+        if tile_weights is not None:
+            self.weights = np.array(weights, dtype=np.float64)
+            self.compile_weights()
+    @classmethod
+    def from_arrays(cls, starts, counts, codepoints,
+                    weights=None, thresholds=None, aliases=None):
+        """
+        Returns a TileIndex using the arrays of an existing TileIndex.
+        If only `weights` is given, the alias tables are compiled from it.
+        """
+        index = cls.__new__(cls)
+        index.starts = starts
+        index.counts = counts
+        index.codepoints = codepoints
+        index.weights = weights
+        index.thresholds = thresholds
+        index.aliases = aliases
+        index.choices = None
+        if weights is not None and thresholds is None:
+            index.compile_weights()
+        elif thresholds is not None:
+            index.link_aliases()
+        return index
+    def compile_weights(self):
+        """
+        Builds an alias table for each tile group from self.weights,
+        storing the thresholds of each group's tiles in self.thresholds,
+        and the positions in self.codepoints of their aliases in self.aliases.
+        See also: `AliasTable`
+        """
+        self.thresholds = np.ones(len(self.codepoints), dtype=np.float64)
+        self.aliases = np.arange(len(self.codepoints), dtype=np.int64)
+        weights = self.weights.tolist()
+        for start, count in zip(self.starts[self.counts > 0].tolist(),
+                                self.counts[self.counts > 0].tolist()):
+            table = AliasTable(weights[start:start+count])
+            self.thresholds[start:start+count] = table.thresholds
+            self.aliases[start:start+count] = [start+a for a in table.aliases]
+        self.link_aliases()
+    def link_aliases(self):
+        """
+        Stores each tile's codepoint and its alias's codepoint
+        next to each other in self.choices,
+        so that `select` can read either with one gather.
+        """
+        self.choices = np.empty(2*len(self.codepoints), dtype=np.int32)
+        self.choices[0::2] = self.codepoints
+        self.choices[1::2] = self.codepoints[self.aliases]
+    def tile_groups(self, terrains, values=None):
+        """
+        Returns the tile groups in the format of `Display.tile_groups`,
+        given the terrain for each terrain code.
+        If `values` is given, such as self.weights,
+        the groups contain its values instead of codepoints.
+        """
+        codepoints = (self.codepoints if values is None else values).tolist()
+        return {tuple(terrains[t] for t in key): codepoints[start:start+count]
+                for (key, start, count) in zip(zip(*np.nonzero(self.counts)),
+                                               self.starts[self.counts > 0].tolist(),
+                                               self.counts[self.counts > 0].tolist())}
+    def corners(self, grid):
+        """
+        Returns the four (height-1, width-1) arrays of terrain codes in the corners
+        of each tile of a terrain code grid, in the order used by `Display.get_tile_corners`.
+        """
+        grid = np.asarray(grid, dtype=np.intp)
+        return (grid[:-1,:-1], grid[1:,:-1], grid[:-1,1:], grid[1:,1:])
+    def select(self, grid, rng):
+        """
+        Returns an array of codepoints with one random tile for each tile of
+        a terrain code grid, drawing every random number in a single batch.
+        Weighted tiles are sampled from the same draws, with their alias tables.
+        Raises KeyError if a tile's corners have no tile group.
+        """
+        key = self.corners(grid)
+        # Flat group indices are cheaper to gather with than four index arrays
+        groups = np.ravel_multi_index(key, self.counts.shape)
+        counts = self.counts.ravel().take(groups)
+        if not counts.all():
+            missing = tuple(int(k[np.nonzero(counts == 0)][0]) for k in key)
+            raise KeyError(missing)
+        draws = rng.random(counts.shape)*counts
+        picks = draws.astype(np.int64)
+        positions = self.starts.ravel().take(groups) + picks
+        if self.thresholds is None:
+            return self.codepoints.take(positions)
+        aliased = draws-picks >= self.thresholds.take(positions)
+        return self.choices.take(2*positions + aliased)
+    def sample(self, key, rng=random):
+        """
+        Returns the codepoint of one random tile from group `key`,
+        a tuple of four terrain codes, using one draw from `rng`.
+        Raises KeyError if there is no such group.
+        """
+        count = int(self.counts[key])
+        if count == 0:
+            raise KeyError(key)
+        u = rng.random()*count
+        i = int(u)
+        position = int(self.starts[key]) + i
+        if self.thresholds is not None and u-i >= self.thresholds[position]:
+            position = int(self.aliases[position])
+        return int(self.codepoints[position])
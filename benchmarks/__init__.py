@@ -0,0 +1,18 @@
+"""
+Benchmarks for Wangview, which run headlessly on synthetic Wangscape metadata.
+
+* `synthetic` writes Wangscape-style metadata files with a configurable structure.
+* `stub_terminal` replaces `bearlibterminal` so that `Display` can be built without a window,
+  and its `RecordingRenderer` records what `Display.draw` would draw.
+* `python -m benchmarks` times the main stages of generating and drawing a scene
+  and writes the results as JSON; `python -m benchmarks.compare` compares two results files.
+* `python -m benchmarks.draw_rows` compares terminal calls and frame times when drawing a tile or a row at a time.
+* `python -m benchmarks.metadata_cache` compares cold and warm metadata load times.
+* `python -m benchmarks.propagation` compares constraint propagation with restarting greedy generation.
+* `python -m benchmarks.weighted` compares uniform and weighted terrain and tile sampling.
+* `python -m benchmarks.overview` times the zoomed out view of map files of increasing size.
+* `python -m benchmarks.brush` times re-rolling the brush in scenes of increasing size.
+* `python -m benchmarks.soak` runs a headless soak test of scrolling, and reports the frame rate and frame times achieved.
+* `python -m benchmarks.parallel` measures how `ParallelGenerator` scales with worker processes.
+* `python -m benchmarks.batch` measures how `BatchGenerator`'s maps per second scale with worker processes.
+"""
@@ -0,0 +1,97 @@
+"""
+Times the main stages of generating and drawing a scene
+across several grid sizes, on synthetic metadata with a stubbed terminal,
+and writes the results as JSON.
+
+Usage: python -m benchmarks [--output results.json] [--sizes 30x20,120x80] ...
+Compare two results files with: python -m benchmarks.compare old.json new.json
+"""
+import argparse
+import json
+import platform
+import sys
+import tempfile
+from time import perf_counter
+
+from . import stub_terminal
+from .synthetic import STRUCTURES, write_metadata
+
+terminal = stub_terminal.install()
+from Wangview.Display import Display
+
+
+def time_call(function, repeats):
+    """Returns the minimum and mean time of `repeats` calls to `function`, in seconds"""
+    times = []
+    for i in range(repeats):
+        start = perf_counter()
+        function()
+        times.append(perf_counter() - start)
+    return {'min': min(times), 'mean': sum(times)/len(times), 'repeats': repeats}
+
+
+def full_frame(display):
+    """Draws and refreshes a scene in which every tile has changed"""
+    display.mark_all_dirty()
+    display.draw()
+    terminal.refresh()
+
+
+def run(directory, sizes, repeats):
+    """Yields one result dict per benchmark and grid size"""
+    for width, height in sizes:
+        terminal.resize(width, height)
+        display = Display(directory)
+        cells = display.tile_width*display.tile_height
+        benchmarks = [
+            ('Hypergraph.generate_lines',
+             lambda: list(display.hypergraph.generate_lines(
+                 display.terrain_width, display.terrain_height))),
+            ('Display.init_terrain_map', display.init_terrain_map),
+            ('Display.init_tile_map', display.init_tile_map),
+            ('Display.draw_iter', lambda: list(display.draw_iter())),
+            ('full frame', lambda: full_frame(display)),
+        ]
+        for name, function in benchmarks:
+            result = {'name': name, 'size': [width, height], 'cells': cells}
+            result.update(time_call(function, repeats))
+            yield result
+
+
+def parse_size(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--output', help='JSON file to write (default: stdout)')
+    parser.add_argument('--sizes', default='30x20,120x80,300x200',
+                        help='comma-separated grid sizes in cells')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--terrains', type=int, default=6)
+    parser.add_argument('--structure', choices=STRUCTURES, default='ring')
+    parser.add_argument('--clique-size', type=int, default=3)
+    parser.add_argument('--tiles-per-group', type=int, default=2)
+    parser.add_argument('--metadata-dir',
+                        help='write the synthetic metadata here instead of a temporary directory')
+    args = parser.parse_args(argv)
+    sizes = [parse_size(s) for s in args.sizes.split(',')]
+    with tempfile.TemporaryDirectory() as directory:
+        directory = args.metadata_dir or directory
+        metadata = write_metadata(directory, args.terrains, args.structure,
+                                  args.clique_size, args.tiles_per_group)
+        results = {'python': sys.version.split()[0],
+                   'platform': platform.platform(),
+                   'metadata': metadata,
+                   'results': list(run(directory, sizes, args.repeats))}
+    text = json.dumps(results, indent=1)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""
+Measures how BatchGenerator's maps per second scale with the number of worker processes,
+on synthetic metadata, and checks that every worker count writes the same maps.
+
+Usage: python -m benchmarks.batch [COUNT] [SIZE] [MAX_WORKERS]
+"""
+import filecmp
+import os
+from os import path
+import sys
+import tempfile
+
+from .synthetic import write_metadata
+from Wangview.BatchGenerator import BatchGenerator
+from Wangview.Generator import Generator
+
+
+def main(count=32, size=128, max_workers=None, seed=0):
+    max_workers = max_workers or os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as directory:
+        write_metadata(directory, terrain_count=8)
+        generator = Generator(directory)
+        print('{0} maps of {1}x{1} tiles, {2} cpus'.format(count, size, os.cpu_count()))
+        print('{0:>7} {1:>10} {2:>8} {3:>8} {4:>10}'.format(
+            'workers', 'time (s)', 'maps/s', 'speedup', 'identical'))
+        reference = baseline = None
+        for workers in range(1, max_workers+1):
+            output = path.join(directory, 'batch{0}'.format(workers))
+            stats = BatchGenerator(generator, workers).run(output, count, size, size, seed)
+            names = [path.basename(BatchGenerator.map_filename(output, i))
+                     for i in range(count)]
+            if reference is None:
+                reference, baseline = output, stats['seconds']
+            identical = filecmp.cmpfiles(reference, output, names, shallow=False)[0] == names
+            print('{0:>7} {1:>10.2f} {2:>8.2f} {3:>7.2f}x {4:>10}'.format(
+                workers, stats['seconds'], stats['maps_per_second'],
+                baseline/stats['seconds'], str(identical)))
+
+
+if __name__ == '__main__':
+    main(*(int(a) for a in sys.argv[1:4]))
@@ -0,0 +1,78 @@
+"""
+Times re-rolling the terrain under the brush in scenes of increasing size,
+compared with generating a whole new scene,
+using synthetic metadata and a stubbed terminal.
+Re-rolls should take the same time whatever the size of the scene.
+Also checks that re-rolls in a world are kept when they are panned out of view and back.
+
+Usage: python -m benchmarks.brush
+"""
+import random
+import tempfile
+from time import perf_counter
+
+from . import stub_terminal
+from .synthetic import write_metadata
+
+terminal = stub_terminal.install()
+from Wangview.Display import Display
+
+
+def invalid_tiles(display):
+    """Returns the number of tiles in view which don't match their four terrain corners"""
+    return sum(display.tile_map[ty, tx] not in
+               display.tile_groups[tuple(display.get_tile_corners(tx, ty))]
+               for ty in range(display.tile_height)
+               for tx in range(display.tile_width))
+
+
+def check_world(directory, rerolls=20, distance=12, seed=0):
+    """
+    Re-rolls terrain in a world, then pans the view a tile at a time
+    `distance` tiles right and down and back again,
+    so the edited cells leave the view and return, a few columns and rows at a time.
+    Raises AssertionError if any tile in view stops matching its corners.
+    """
+    rng = random.Random(seed)
+    terminal.resize(30, 20)
+    display = Display(directory, background_regeneration=False, metadata_cache=False,
+                      world_seed=seed)
+    display.brush_radius = 3
+    for i in range(rerolls):
+        display.reroll(rng.randrange(display.terrain_width), rng.randrange(display.terrain_height))
+    before = display.terrain_map.to_array()
+    rw, rh = display.resolution
+    for dx, dy in [(rw, 0)]*distance + [(-rw, 0)]*distance + [(0, rh)]*distance + [(0, -rh)]*distance:
+        display.pan(dx, dy)
+        assert invalid_tiles(display) == 0, 'Tiles in a world stopped matching their corners'
+    assert (display.terrain_map.to_array() == before).all(), 'Re-rolled world terrain was lost'
+
+
+def main(sizes=((30, 20), (120, 80), (300, 200)), radii=(2, 6), rerolls=50):
+    print('{0:>9} {1:>14} {2}'.format(
+        'cells', 'new scene (ms)',
+        ' '.join('{0:>16}'.format('radius {0} (ms)'.format(r)) for r in radii)))
+    with tempfile.TemporaryDirectory() as directory:
+        write_metadata(directory, 8, 'random')
+        check_world(directory)
+        for width, height in sizes:
+            terminal.resize(width, height)
+            display = Display(directory, background_regeneration=False, metadata_cache=False)
+            start = perf_counter()
+            display.new_scene()
+            scene = perf_counter() - start
+            times = []
+            for radius in radii:
+                display.brush_radius = radius
+                start = perf_counter()
+                for i in range(rerolls):
+                    display.reroll(random.randrange(display.terrain_width),
+                                   random.randrange(display.terrain_height))
+                times.append((perf_counter() - start)/rerolls)
+            print('{0:>9} {1:>14.2f} {2}'.format(
+                '{0}x{1}'.format(width, height), scene*1e3,
+                ' '.join('{0:>16.2f}'.format(t*1e3) for t in times)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+"""
+Compares two JSON results files written by `python -m benchmarks`.
+
+Usage: python -m benchmarks.compare old.json new.json
+"""
+import argparse
+import json
+
+
+def load(filename):
+    with open(filename) as f:
+        return {(r['name'], tuple(r['size'])): r for r in json.load(f)['results']}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('old')
+    parser.add_argument('new')
+    args = parser.parse_args(argv)
+    old = load(args.old)
+    new = load(args.new)
+    print('{0:<28} {1:>9} {2:>12} {3:>12} {4:>8}'.format(
+        'benchmark', 'size', 'old (ms)', 'new (ms)', 'ratio'))
+    for key in sorted(set(old) & set(new)):
+        name, (width, height) = key
+        a = old[key]['min']
+        b = new[key]['min']
+        print('{0:<28} {1:>9} {2:>12.3f} {3:>12.3f} {4:>7.2f}x'.format(
+            name, '{0}x{1}'.format(width, height), a*1e3, b*1e3, a/b if b else float('inf')))
+
+
+if __name__ == '__main__':
+    main()
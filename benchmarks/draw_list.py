@@ -0,0 +1,58 @@
+"""
+Micro-benchmark of the per-frame cost of Display's draw loop,
+comparing the draw arguments generated by `Display.draw_iter`
+with the cached `Display.draw_list`.
+put_ext is replaced by a no-op function,
+so only the Python overhead of a frame is measured.
+
+Usage: python -m benchmarks.draw_list
+"""
+import random
+from timeit import repeat
+
+from . import stub_terminal
+
+stub_terminal.install()
+from Wangview.Display import Display
+from Wangview.RingGrid import RingGrid
+
+
+def make_display(width, height, resolution=(32, 32)):
+    """Returns a Display with a random tile map, without reading metadata or opening a terminal"""
+    d = Display.__new__(Display)
+    d.resolution = resolution
+    d.init_geometry(width, height)
+    d.tile_map = RingGrid.from_lines([[random.randrange(0xE000, 0xE100)
+                                       for x in range(d.tile_width)]
+                                      for y in range(d.tile_height)])
+    d.draw_list = list(d.draw_iter())
+    return d
+
+
+def put_ext(x, y, dx, dy, c):
+    pass
+
+
+def frame_before(d):
+    for draw_args in d.draw_iter():
+        put_ext(*draw_args)
+
+
+def frame_after(d):
+    for draw_args in d.draw_list:
+        put_ext(*draw_args)
+
+
+def main(sizes=((30, 20), (120, 80), (300, 200)), repeats=5):
+    print('{0:>9} {1:>12} {2:>12} {3:>8}'.format('cells', 'before (ms)', 'after (ms)', 'speedup'))
+    for width, height in sizes:
+        d = make_display(width, height)
+        number = max(1, 100000//(width*height))
+        before = min(repeat(lambda: frame_before(d), number=number, repeat=repeats))/number
+        after = min(repeat(lambda: frame_after(d), number=number, repeat=repeats))/number
+        print('{0:>9} {1:>12.3f} {2:>12.3f} {3:>7.2f}x'.format(
+            '{0}x{1}'.format(width, height), before*1e3, after*1e3, before/after))
+
+
+if __name__ == '__main__':
+    main()
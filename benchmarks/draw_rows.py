@@ -0,0 +1,53 @@
+"""
+Compares full redraws one tile at a time with redraws a row at a time,
+counting terminal calls per frame with a RecordingRenderer,
+and timing frames against the stubbed terminal,
+whose calls stand in for bearlibterminal's foreign function calls.
+
+Usage: python -m benchmarks.draw_rows
+"""
+from timeit import repeat
+
+from . import stub_terminal
+from .draw_list import make_display
+
+stub_terminal.install()
+from .stub_terminal import RecordingRenderer
+from Wangview.FrameProfiler import FrameProfiler
+from Wangview.Renderer import Renderer
+
+
+def frame(d):
+    d.mark_all_dirty()
+    d.draw()
+
+
+def main(sizes=((30, 20), (120, 80), (300, 200)), repeats=5):
+    print('{0:>9} {1:>12} {2:>12} {3:>12} {4:>12} {5:>8}'.format(
+        'cells', 'tile calls', 'row calls', 'tiles (ms)', 'rows (ms)', 'speedup'))
+    for width, height in sizes:
+        d = make_display(width, height)
+        d.profiler = FrameProfiler()
+        d.dirty_tiles = set()
+        d.zoom = 0
+        number = max(1, 100000//(width*height))
+        calls = {}
+        times = {}
+        for batch_rows in (False, True):
+            d.batch_rows = batch_rows
+            d.renderer = RecordingRenderer()
+            frame(d)
+            assert d.renderer.tiles() == sorted(d.draw_iter())
+            calls[batch_rows] = len(d.renderer.calls)
+            d.renderer = Renderer()
+            # The draw lists are rebuilt on every frame,
+            # so the times include building them
+            times[batch_rows] = min(repeat(lambda: frame(d), number=number,
+                                           repeat=repeats))/number
+        print('{0:>9} {1:>12} {2:>12} {3:>12.3f} {4:>12.3f} {5:>7.2f}x'.format(
+            '{0}x{1}'.format(width, height), calls[False], calls[True],
+            times[False]*1e3, times[True]*1e3, times[False]/times[True]))
+
+
+if __name__ == '__main__':
+    main()
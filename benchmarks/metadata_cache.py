@@ -0,0 +1,49 @@
+"""
+Compares Display's metadata load time without the compiled metadata cache,
+on a cold start which writes the cache, and on a warm start which reads it,
+using synthetic metadata and a stubbed terminal.
+
+Usage: python -m benchmarks.metadata_cache
+"""
+import random
+import tempfile
+
+from . import stub_terminal
+from .synthetic import write_metadata
+
+stub_terminal.install()
+from Wangview.Display import Display
+
+
+def load(directory, use_cache):
+    """Returns a Display whose metadata was read from `directory`, without generating a scene"""
+    display = Display.__new__(Display)
+    display.init_metadata(directory, 'tile_groups.json', 'terrain_hypergraph.json',
+                          'tilesets.json', use_cache)
+    return display
+
+
+def main(configurations=((6, 2), (12, 4), (20, 8), (30, 4))):
+    print('{0:>8} {1:>11} {2:>12} {3:>10} {4:>10} {5:>8}'.format(
+        'terrains', 'tile groups', 'uncached (s)', 'cold (s)', 'warm (s)', 'speedup'))
+    for terrains, tiles_per_group in configurations:
+        with tempfile.TemporaryDirectory() as directory:
+            metadata = write_metadata(directory, terrains, 'random',
+                                      tiles_per_group=tiles_per_group)
+            uncached = load(directory, False)
+            cold = load(directory, True)
+            warm = load(directory, True)
+            assert not cold.metadata_cache_hit and warm.metadata_cache_hit
+            assert warm.tile_groups == uncached.tile_groups
+            # Both compute the same options, whether cached or not
+            assert (list(warm.hypergraph.generate_lines_codes(40, 30, random.Random(0))) ==
+                    list(uncached.hypergraph.generate_lines_codes(40, 30, random.Random(0))))
+            assert warm.hypergraph.option_table == uncached.hypergraph.option_table
+            print('{0:>8} {1:>11} {2:>12.3f} {3:>10.3f} {4:>10.3f} {5:>7.1f}x'.format(
+                terrains, metadata['tile_groups'], uncached.metadata_load_time,
+                cold.metadata_load_time, warm.metadata_load_time,
+                uncached.metadata_load_time/warm.metadata_load_time))
+
+
+if __name__ == '__main__':
+    main()
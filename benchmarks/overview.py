@@ -0,0 +1,49 @@
+"""
+Times building the overview pyramid of map files of increasing size,
+and drawing zoomed out frames of them,
+using synthetic metadata and a stubbed terminal.
+Frames should take the same time whatever the size of the map.
+
+Usage: python -m benchmarks.overview
+"""
+from os import path
+import tempfile
+from time import perf_counter
+
+from . import stub_terminal
+from .synthetic import write_metadata
+
+terminal = stub_terminal.install(60, 40)
+from Wangview.Display import Display
+from Wangview.Generator import Generator
+
+
+def time_frames(display, frames):
+    """Returns the mean time to draw a zoomed out frame, panning between frames"""
+    start = perf_counter()
+    for i in range(frames):
+        display.pan(display.resolution[0], 0)
+        display.draw()
+    return (perf_counter() - start)/frames
+
+
+def main(sizes=(250, 500, 1000, 2000), zoom=2, frames=50):
+    print('{0:>10} {1:>7} {2:>12} {3:>10}'.format('map', 'levels', 'pyramid (s)', 'frame (ms)'))
+    with tempfile.TemporaryDirectory() as directory:
+        write_metadata(directory, 8, 'ring')
+        generator = Generator(directory)
+        for size in sizes:
+            filename = path.join(directory, 'map{0}.wvmap'.format(size))
+            generator.write_map(filename, size, size, seed=size)
+            display = Display(directory, map_filename=filename, background_regeneration=False)
+            start = perf_counter()
+            pyramid = display.overview_pyramid()
+            built = perf_counter() - start
+            display.set_zoom(zoom)
+            frame = time_frames(display, frames)
+            print('{0:>10} {1:>7} {2:>12.3f} {3:>10.3f}'.format(
+                '{0}x{0}'.format(size), len(pyramid), built, frame*1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Measures how ParallelGenerator scales with the number of worker processes,
+on synthetic metadata, against the sequential generators it must beat:
+`ArrayEngine.generate`, which speedups are relative to,
+and `Hypergraph.generate_lines_codes`.
+Times include starting the worker processes.
+Also checks that every worker count gives the same valid map.
+
+Usage: python -m benchmarks.parallel [SIZE] [MAX_WORKERS]
+"""
+import json
+import os
+from os import path
+import random
+import sys
+import tempfile
+from time import perf_counter
+
+import numpy as np
+
+from .synthetic import write_metadata
+from Wangview.ArrayEngine import ArrayEngine
+from Wangview.Hypergraph import Hypergraph
+from Wangview.ParallelGenerator import ParallelGenerator
+
+
+def timed(function):
+    """Returns the result of calling `function`, and the seconds it took"""
+    start = perf_counter()
+    result = function()
+    return result, perf_counter() - start
+
+
+def main(size=512, max_workers=None, seed=0):
+    max_workers = max_workers or os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as directory:
+        write_metadata(directory, terrain_count=8)
+        with open(path.join(directory, 'terrain_hypergraph.json')) as f:
+            hypergraph = Hypergraph(json.load(f))
+    engine = ArrayEngine(hypergraph)
+    print('{0}x{0} terrain, {1} cpus'.format(size, os.cpu_count()))
+    print('{0:<26} {1:>10} {2:>8} {3:>10}'.format('generator', 'time (s)', 'speedup', 'identical'))
+    # The sequential baselines, each warmed up once
+    list(hypergraph.generate_lines_codes(size, size-1, random.Random(seed)))
+    engine.generate(size, size, seed)
+    lines, sequential = timed(lambda: list(
+        hypergraph.generate_lines_codes(size, size-1, random.Random(seed))))
+    grid, baseline = timed(lambda: engine.generate(size, size, seed))
+    print('{0:<26} {1:>10.3f} {2:>7.2f}x'.format('generate_lines_codes', sequential,
+                                                baseline/sequential))
+    print('{0:<26} {1:>10.3f} {2:>7.2f}x'.format('ArrayEngine.generate', baseline, 1.))
+    reference = None
+    for workers in range(1, max_workers+1):
+        generator = ParallelGenerator(hypergraph, workers=workers)
+        grid, elapsed = timed(lambda: generator.generate(size, size, seed))
+        assert engine.is_valid(grid)
+        if reference is None:
+            reference = grid
+        print('{0:<26} {1:>10.3f} {2:>7.2f}x {3:>10}'.format(
+            'ParallelGenerator, {0} workers'.format(workers), elapsed, baseline/elapsed,
+            str(np.array_equal(grid, reference))))
+
+
+if __name__ == '__main__':
+    main(*(int(a) for a in sys.argv[1:3]))
@@ -0,0 +1,84 @@
+"""
+Compares `Hypergraph.generate_grid_codes`, which propagates constraints
+and backtracks locally, with greedy line-by-line generation
+which restarts the whole grid whenever it reaches a dead end,
+on grids where some cells are fixed in advance, using sparse synthetic cliques.
+
+Usage: python -m benchmarks.propagation
+"""
+import json
+from os import path
+import random
+import tempfile
+from time import perf_counter
+
+from .synthetic import write_metadata
+from Wangview.Hypergraph import Hypergraph
+
+
+def greedy_with_restarts(hypergraph, width, height, fixed, rng, max_attempts):
+    """
+    Generates lines like `Hypergraph.generate_line_codes`,
+    choosing each fixed cell's value if it is an option,
+    and restarting from the first line if it isn't.
+    Returns the grid and the number of attempts, or None and max_attempts.
+    """
+    m = hypergraph.missing
+    n = m+1
+    table = hypergraph.option_table
+    for attempt in range(1, max_attempts+1):
+        lines = []
+        up = [m]*(width+2)
+        try:
+            for y in range(height):
+                line = []
+                left = m
+                for x in range(width):
+                    options = table[((left*n + up[x])*n + up[x+1])*n + up[x+2]]
+                    f = fixed[y][x]
+                    if f is None:
+                        left = rng.choice(options)
+                    elif f in options:
+                        left = f
+                    else:
+                        raise IndexError(f)
+                    line.append(left)
+                lines.append(line)
+                up = [m] + line + [m, m]
+        except IndexError:
+            continue
+        return lines, attempt
+    return None, max_attempts
+
+
+def main(width=40, height=30, fixed_counts=(0, 2, 4, 8, 16, 64), max_attempts=20000, seed=0):
+    with tempfile.TemporaryDirectory() as directory:
+        write_metadata(directory, terrain_count=8, structure='ring', clique_size=3)
+        with open(path.join(directory, 'terrain_hypergraph.json')) as f:
+            hypergraph = Hypergraph(json.load(f))
+    rng = random.Random(seed)
+    reference = hypergraph.generate_grid_codes(width, height, rng)
+    print('{0}x{1} grid, 8 terrains in a ring of 3-cliques'.format(width, height))
+    print('{0:>6} {1:>12} {2:>9} {3:>14} {4:>12} {5:>11} {6:>8}'.format(
+        'fixed', 'restart (s)', 'attempts', 'propagate (s)', 'propagations',
+        'backtracks', 'speedup'))
+    for count in fixed_counts:
+        # Fixing cells of a valid grid guarantees that a solution exists
+        fixed = [[None]*width for y in range(height)]
+        for x, y in rng.sample([(x, y) for x in range(width) for y in range(height)], count):
+            fixed[y][x] = reference[y][x]
+        start = perf_counter()
+        grid, attempts = greedy_with_restarts(hypergraph, width, height, fixed, rng, max_attempts)
+        restart_time = perf_counter() - start
+        stats = {}
+        start = perf_counter()
+        hypergraph.generate_grid_codes(width, height, rng, fixed, stats=stats)
+        propagate_time = perf_counter() - start
+        print('{0:>6} {1:>12.3f} {2:>9} {3:>14.3f} {4:>12} {5:>11} {6:>7.1f}x'.format(
+            count, restart_time, attempts if grid is not None else '>{0}'.format(max_attempts),
+            propagate_time, stats.get('propagations', 0), stats.get('backtracks', 0),
+            restart_time/propagate_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Soak test: runs Display's frame loop under an Autopilot against the stubbed terminal,
+panning continuously and replacing the scene periodically on synthetic metadata,
+and reports the frame rate achieved, frame time percentiles,
+scene generation times and peak memory use.
+
+Usage: python -m benchmarks.soak [--size 60x40] [--frames 600 | --duration SECONDS] [--output report.json]
+"""
+import argparse
+import json
+import platform
+import sys
+import tempfile
+
+from . import stub_terminal
+from .synthetic import STRUCTURES, write_metadata
+from .__main__ import parse_size
+
+terminal = stub_terminal.install()
+from Wangview.Autopilot import Autopilot
+from Wangview.Display import Display
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--output', help='JSON file to write the report to')
+    parser.add_argument('--size', type=parse_size, default=(60, 40), help='window size in cells')
+    parser.add_argument('--frames', type=int, default=600)
+    parser.add_argument('--duration', type=float,
+                        help='seconds to run for, instead of a number of frames')
+    parser.add_argument('--fps', type=int, default=60, help='target frame rate')
+    parser.add_argument('--regenerate-every', type=int, default=150,
+                        help='frames between new scenes, or 0 for none')
+    parser.add_argument('--world-seed', type=int,
+                        help='pan around a world generated in chunks from this seed')
+    parser.add_argument('--foreground', action='store_true',
+                        help='generate new scenes in the frame loop, without a SceneWorker')
+    parser.add_argument('--terrains', type=int, default=6)
+    parser.add_argument('--structure', choices=STRUCTURES, default='ring')
+    args = parser.parse_args(argv)
+    terminal.resize(*args.size)
+    with tempfile.TemporaryDirectory() as directory:
+        metadata = write_metadata(directory, args.terrains, args.structure)
+        display = Display(directory, fps=args.fps, world_seed=args.world_seed,
+                          background_regeneration=not args.foreground, metadata_cache=False)
+        autopilot = Autopilot(display, None if args.duration else args.frames, args.duration,
+                              regenerate_every=args.regenerate_every)
+        report = autopilot.run()
+    print('\n'.join(Autopilot.report_lines(report)))
+    if args.output:
+        report.update({'python': sys.version.split()[0],
+                       'platform': platform.platform(),
+                       'metadata': metadata})
+        with open(args.output, 'w') as f:
+            f.write(json.dumps(report, indent=1) + '\n')
+
+
+if __name__ == '__main__':
+    main()
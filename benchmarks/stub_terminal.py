@@ -0,0 +1,195 @@
+"""
+A stand-in for the `bearlibterminal` package,
+so that `Display` can be built and driven without opening a window.
+
+Call `install()` before importing `Wangview.Display`.
+Every call is counted in `StubTerminal.calls`,
+and input events can be queued with `StubTerminal.queue`.
+`RecordingRenderer` records the drawing calls of a Display instead.
+"""
+from collections import Counter, deque
+import re
+import sys
+import types
+
+from Wangview.Renderer import Renderer
+
+
+class StubTerminal(types.ModuleType):
+    """Implements the parts of `bearlibterminal.terminal` used by Wangview"""
+    TK_A = 0x04
+    TK_M = 0x10
+    TK_RETURN = 0x28
+    TK_ESCAPE = 0x29
+    TK_TAB = 0x2B
+    TK_SPACE = 0x2C
+    TK_MINUS = 0x2D
+    TK_EQUALS = 0x2E
+    TK_F1 = 0x3A
+    TK_RIGHT = 0x4F
+    TK_LEFT = 0x50
+    TK_DOWN = 0x51
+    TK_UP = 0x52
+    TK_SHIFT = 0x70
+    TK_CONTROL = 0x71
+    TK_MOUSE_LEFT = 0x80
+    TK_MOUSE_RIGHT = 0x81
+    TK_MOUSE_MIDDLE = 0x82
+    TK_MOUSE_MOVE = 0x85
+    TK_MOUSE_SCROLL = 0x86
+    TK_MOUSE_X = 0x87
+    TK_MOUSE_Y = 0x88
+    TK_MOUSE_PIXEL_X = 0x89
+    TK_MOUSE_PIXEL_Y = 0x8A
+    TK_MOUSE_WHEEL = 0x8B
+    TK_KEY_RELEASED = 0x100
+    TK_WIDTH = 0xC0
+    TK_HEIGHT = 0xC1
+    TK_CELL_WIDTH = 0xC2
+    TK_CELL_HEIGHT = 0xC3
+    TK_LAYER = 0xC6
+    TK_CLOSE = 0xE0
+    TK_RESIZED = 0xE1
+    TK_ALIGN_DEFAULT = 0
+    TK_ALIGN_LEFT = 1
+    TK_ALIGN_RIGHT = 2
+    TK_ALIGN_CENTER = 3
+    TK_ALIGN_TOP = 4
+    TK_ALIGN_BOTTOM = 8
+    TK_ALIGN_MIDDLE = 12
+
+    def __init__(self, width=30, height=20):
+        super(StubTerminal, self).__init__('bearlibterminal.terminal')
+        self.calls = Counter()
+        self.events = deque()
+        # Values returned by state(), including held keys
+        self.states = {self.TK_WIDTH: width, self.TK_HEIGHT: height}
+
+    def resize(self, width, height):
+        """Changes the size reported by state(TK_WIDTH) and state(TK_HEIGHT)"""
+        self.states[self.TK_WIDTH] = width
+        self.states[self.TK_HEIGHT] = height
+
+    def queue(self, *events):
+        """Appends events to be returned by read()"""
+        self.events.extend(events)
+
+    def _count(name):
+        def call(self, *args, **kwargs):
+            self.calls[name] += 1
+        call.__name__ = name
+        return call
+
+    open = _count('open')
+    close = _count('close')
+    set = _count('set')
+    refresh = _count('refresh')
+    clear = _count('clear')
+    clear_area = _count('clear_area')
+    crop = _count('crop')
+    layer = _count('layer')
+    color = _count('color')
+    bkcolor = _count('bkcolor')
+    composition = _count('composition')
+    put = _count('put')
+    put_ext = _count('put_ext')
+    del _count
+
+    def print_(self, x, y, s, *args, **kwargs):
+        self.calls['print'] += 1
+        return (len(s), 1)
+    printf = print_
+
+    def state(self, key):
+        return self.states.get(key, 0)
+
+    def check(self, key):
+        return bool(self.states.get(key, 0))
+
+    def has_input(self):
+        return bool(self.events)
+
+    def read(self):
+        self.calls['read'] += 1
+        return self.events.popleft() if self.events else self.TK_CLOSE
+
+    def peek(self):
+        return self.events[0] if self.events else 0
+
+    def delay(self, period):
+        pass
+
+    def color_from_argb(self, a, r, g, b):
+        return (a << 24) | (r << 16) | (g << 8) | b
+
+    def color_from_name(self, name):
+        return 0xFFFFFFFF
+
+
+def install(width=30, height=20):
+    """
+    Registers a StubTerminal as `bearlibterminal.terminal`, and returns it.
+    If one is already registered, it is resized and reused,
+    since modules which have already imported bearlibterminal keep a reference to it.
+    """
+    terminal = sys.modules.get('bearlibterminal.terminal')
+    if isinstance(terminal, StubTerminal):
+        terminal.resize(width, height)
+        return terminal
+    terminal = StubTerminal(width, height)
+    package = types.ModuleType('bearlibterminal')
+    package.terminal = terminal
+    sys.modules['bearlibterminal'] = package
+    sys.modules['bearlibterminal.terminal'] = terminal
+    return terminal
+
+
+class RecordingRenderer(Renderer):
+    """
+    A Renderer which records its calls in `calls`, a list of (method, args) pairs,
+    instead of drawing. Set it as `Display.renderer`.
+    """
+    offset = re.compile(r'\[offset=(-?\d+),(-?\d+)\]')
+
+    def __init__(self):
+        self.calls = []
+
+    def _record(name):
+        def call(self, *args):
+            self.calls.append((name, args))
+        call.__name__ = name
+        return call
+
+    clear = _record('clear')
+    clear_area = _record('clear_area')
+    layer = _record('layer')
+    put = _record('put')
+    put_row = _record('put_row')
+    text = _record('text')
+    del _record
+
+    def counts(self):
+        """Returns a Counter of the calls to each method"""
+        return Counter(name for (name, args) in self.calls)
+
+    def tiles(self):
+        """
+        Returns a sorted list of (x, y, dx, dy, codepoint) for every tile drawn,
+        with rows split into their tiles, and blank cells left out.
+        """
+        tiles = []
+        for name, args in self.calls:
+            if name == 'put':
+                tiles.append(args)
+            elif name == 'put_row':
+                x, y, text = args
+                match = self.offset.match(text)
+                dx, dy = (int(match.group(1)), int(match.group(2))) if match else (0, 0)
+                for i, c in enumerate(text[match.end() if match else 0:]):
+                    if c != ' ':
+                        tiles.append((x+i, y, dx, dy, ord(c)))
+        return sorted(tiles)
+
+    def reset(self):
+        """Forgets every recorded call"""
+        del self.calls[:]
@@ -0,0 +1,103 @@
+"""
+Writes synthetic Wangscape metadata:
+`tilesets.json`, `tile_groups.json` and `terrain_hypergraph.json`,
+and optionally the tileset images themselves.
+"""
+from itertools import combinations, product
+import json
+from os import path
+import random
+
+# Clique structures accepted by `make_cliques`
+STRUCTURES = ('ring', 'random', 'pairs', 'complete')
+
+
+def make_cliques(terrains, structure='ring', clique_size=3, seed=0):
+    """
+    Returns a sorted list of cliques (tuples of terrain names).
+    'ring': each terrain with the next clique_size-1 terrains, wrapping around.
+    'random': a ring of pairs, plus len(terrains) random cliques of clique_size.
+    'pairs': every pair of terrains.
+    'complete': one clique containing every terrain.
+    """
+    n = len(terrains)
+    if structure == 'ring':
+        cliques = {tuple(sorted(terrains[(i+j) % n] for j in range(min(clique_size, n))))
+                   for i in range(n)}
+    elif structure == 'random':
+        rng = random.Random(seed)
+        cliques = {tuple(sorted((terrains[i], terrains[(i+1) % n]))) for i in range(n)}
+        cliques.update(tuple(sorted(rng.sample(terrains, min(clique_size, n))))
+                       for i in range(n))
+    elif structure == 'pairs':
+        cliques = set(combinations(terrains, 2))
+    elif structure == 'complete':
+        cliques = {tuple(terrains)}
+    else:
+        raise ValueError('Unknown clique structure: {0}'.format(structure))
+    return sorted(cliques)
+
+
+def write_metadata(directory, terrain_count=6, structure='ring', clique_size=3,
+                   tiles_per_group=2, resolution=(32, 32), columns=16,
+                   images=False, seed=0):
+    """
+    Writes metadata for `terrain_count` terrains to `directory`.
+    Each clique gets a tileset containing `tiles_per_group` tiles
+    for every combination of its terrains in the four corners of a tile.
+    If `images` is True, each tileset image is also written,
+    with every tile filled by a distinct colour (this requires Pillow).
+    Returns a dict describing the metadata.
+    """
+    terrains = ['t{0}'.format(i) for i in range(terrain_count)]
+    cliques = make_cliques(terrains, structure, clique_size, seed)
+    tilesets = []
+    tile_groups = {}
+    for i, clique in enumerate(cliques):
+        filename = 'clique_{0}.png'.format(i)
+        corners = list(product(clique, repeat=4))
+        count = len(corners)*tiles_per_group
+        rows = (count+columns-1)//columns
+        tilesets.append({'filename': filename,
+                         'resolution': list(resolution),
+                         'x': columns*resolution[0],
+                         'y': rows*resolution[1],
+                         'terrains': list(clique)})
+        for j, corner in enumerate(corners):
+            group = tile_groups.setdefault('.'.join(corner), [])
+            for k in range(tiles_per_group):
+                n = j*tiles_per_group + k
+                group.append({'filename': filename,
+                              'x': n % columns*resolution[0],
+                              'y': n//columns*resolution[1]})
+        if images:
+            write_image(path.join(directory, filename),
+                        columns*resolution[0], rows*resolution[1], resolution, i)
+    hypergraph = {t: [list(c) for c in cliques if t in c] for t in terrains}
+    for filename, data in (('tilesets.json', tilesets),
+                           ('tile_groups.json', tile_groups),
+                           ('terrain_hypergraph.json', hypergraph)):
+        with open(path.join(directory, filename), 'w') as f:
+            json.dump(data, f)
+    return {'terrains': terrain_count,
+            'structure': structure,
+            'clique_size': clique_size,
+            'cliques': len(cliques),
+            'tile_groups': len(tile_groups),
+            'tiles_per_group': tiles_per_group,
+            'resolution': list(resolution)}
+
+
+def write_image(filename, width, height, resolution, tint):
+    """Writes a tileset image with a distinct colour in every tile"""
+    import numpy as np
+    from PIL import Image
+    rw, rh = resolution
+    ry, rx = height//rh, width//rw
+    colours = np.arange(rx*ry, dtype=np.uint32).reshape(ry, rx)
+    pixels = np.empty((ry, rh, rx, rw, 4), dtype=np.uint8)
+    pixels[..., 0] = (colours*37 % 256)[:, None, :, None]
+    pixels[..., 1] = (colours*101 % 256)[:, None, :, None]
+    pixels[..., 2] = tint*53 % 256
+    pixels[..., 3] = 255
+    Image.fromarray(pixels.reshape(height, width, 4)).save(filename)
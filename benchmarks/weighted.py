@@ -0,0 +1,82 @@
+"""
+Compares uniform and weighted terrain and tile sampling,
+using synthetic metadata and a stubbed terminal,
+and checks that weighted terrain frequencies follow their weights.
+
+Usage: python -m benchmarks.weighted
+"""
+from collections import Counter
+import random
+import tempfile
+from time import perf_counter
+
+import numpy as np
+
+from . import stub_terminal
+from .synthetic import write_metadata
+
+stub_terminal.install()
+from Wangview.Display import Display
+
+
+def load(directory, terrain_weights=None):
+    """Returns a Display whose metadata was read from `directory`, without generating a scene"""
+    display = Display.__new__(Display)
+    display.init_metadata(directory, 'tile_groups.json', 'terrain_hypergraph.json',
+                          'tilesets.json', False, terrain_weights)
+    return display
+
+
+def time_lines(hypergraph, width, height, repeats):
+    """Returns the best time to generate a `width` by `height` grid of terrain codes"""
+    best = float('inf')
+    for i in range(repeats):
+        rng = random.Random(i)
+        start = perf_counter()
+        lines = list(hypergraph.generate_lines_codes(width, height, rng))
+        best = min(best, perf_counter() - start)
+    return best, lines
+
+
+def time_tiles(tile_index, grid, repeats):
+    """Returns the best time to select every tile of a terrain code grid"""
+    best = float('inf')
+    for i in range(repeats):
+        rng = np.random.default_rng(i)
+        start = perf_counter()
+        tile_index.select(grid, rng)
+        best = min(best, perf_counter() - start)
+    return best
+
+
+def main(width=200, height=200, terrains=8, repeats=5):
+    with tempfile.TemporaryDirectory() as directory:
+        write_metadata(directory, terrains, 'ring', tiles_per_group=4)
+        uniform = load(directory)
+        names = uniform.hypergraph.terrains
+        # Make the first terrain rare and the last terrain common
+        weights = {names[0]: 0.1, names[-1]: 10}
+        weighted = load(directory, weights)
+        weighted.tile_index = type(weighted.tile_index)(
+            weighted.tile_groups, weighted.hypergraph.terrain_codes,
+            {k: list(range(1, len(v)+1)) for (k, v) in weighted.tile_groups.items()})
+        print('{0:<10} {1:>14} {2:>14}'.format('sampling', 'terrain (ms)', 'tiles (ms)'))
+        grids = {}
+        for name, display in (('uniform', uniform), ('weighted', weighted)):
+            seconds, lines = time_lines(display.hypergraph, width, height, repeats)
+            grids[name] = lines
+            tiles = time_tiles(display.tile_index, np.array(lines), repeats)
+            print('{0:<10} {1:>14.2f} {2:>14.2f}'.format(name, seconds*1e3, tiles*1e3))
+        print()
+        print('{0:<8} {1:>8} {2:>10} {3:>10}'.format('terrain', 'weight', 'uniform', 'weighted'))
+        counts = {name: Counter(t for line in lines for t in line)
+                  for (name, lines) in grids.items()}
+        total = sum(len(line) for line in lines)
+        for code, terrain in enumerate(names):
+            print('{0:<8} {1:>8} {2:>10.3f} {3:>10.3f}'.format(
+                terrain, weights.get(terrain, 1),
+                counts['uniform'][code]/total, counts['weighted'][code]/total))
+
+
+if __name__ == '__main__':
+    main()
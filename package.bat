@@ -1,9 +1,9 @@
-echo Please ensure PYTHON is set to the directory of Python installation at version 3.4 or earlier.
+echo Please ensure PYTHON is set to the directory of Python installation at version 3.7 or later.
 set OLD_PATH=%PATH%
 PATH=%PYTHON%;%PYTHON%\Scripts;%PATH%
 python --version
 pip --version
-pip install py2exe
+pip install "py2exe>=0.10,<0.13"
 pip install -r requirements.txt
 mkdir dist
 python setup.py py2exe
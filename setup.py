@@ -139,7 +139,9 @@ Wangview = Target(
 #     without unpacking to the file system.  This does not work for
 #     some dlls, so use with caution.
 includes = [
-  'imp'
+  'imp',
+  # Imported lazily by Wangview.Terminal
+  'bearlibterminal.terminal'
 ]
 excludes = [
   '_ssl',